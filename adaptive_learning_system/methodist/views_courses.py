@@ -18,11 +18,12 @@ def courses_list(request):
     """
     search_query = request.GET.get('search', '')
     
-    # Базовая выборка курсов с аннотациями для подсчета связанных объектов
+    # Базовая выборка курсов с аннотациями для подсчета связанных объектов;
+    # навыки для карточек подгружаем одним запросом на все курсы
     courses = Course.objects.annotate(
         skills_count=Count('skills', distinct=True),
         tasks_count=Count('tasks', distinct=True)
-    ).order_by('name')
+    ).prefetch_related('skills').order_by('name')
     
     # Применяем фильтр поиска
     if search_query:
@@ -31,10 +32,13 @@ def courses_list(request):
             Q(description__icontains=search_query)
         )
     
+    # Выполняем выборку один раз: шаблон и счетчик используют один список
+    courses = list(courses)
+    
     context = {
         'courses': courses,
         'search_query': search_query,
-        'total_courses': courses.count(),
+        'total_courses': len(courses),
     }
     
     return render(request, 'methodist/courses_list.html', context)
@@ -52,22 +52,23 @@ def enrollment_management(request):
     # Статистика
     total_students = StudentProfile.objects.filter(is_active=True).count()
     total_courses = Course.objects.count()
-    total_enrollments = StudentCourseEnrollment.objects.count()
-    active_enrollments = StudentCourseEnrollment.objects.filter(
-        status__in=['enrolled', 'in_progress']
-    ).count()
+    enrollment_stats = StudentCourseEnrollment.objects.aggregate(
+        total=Count('id'),
+        active=Count('id', filter=Q(status__in=['enrolled', 'in_progress']))
+    )
     
     context = {
-        'students': students,
-        'courses': courses,
+        # Списки материализуются один раз: шаблон и считает, и перебирает их
+        'students': list(students),
+        'courses': list(courses.prefetch_related('student_enrollments')),
         'all_enrollments': all_enrollments[:20],  # Показываем последние 20 записей
         'student_search': student_search,
         'course_search': course_search,
         'stats': {
             'total_students': total_students,
             'total_courses': total_courses,
-            'total_enrollments': total_enrollments,
-            'active_enrollments': active_enrollments,
+            'total_enrollments': enrollment_stats['total'],
+            'active_enrollments': enrollment_stats['active'],
         }
     }
     
@@ -95,25 +96,19 @@ def enroll_student(request):
         student = get_object_or_404(StudentProfile, id=student_id)
         course = get_object_or_404(Course, id=course_id)
         
-        # Проверяем, не записан ли уже студент на этот курс
-        existing_enrollment = StudentCourseEnrollment.objects.filter(
+        # Записываем студента, если он еще не записан на этот курс
+        enrollment, created = StudentCourseEnrollment.objects.get_or_create(
             student=student,
-            course=course
-        ).first()
+            course=course,
+            defaults={'status': 'enrolled'}
+        )
         
-        if existing_enrollment:
+        if not created:
             return JsonResponse({
                 'success': False,
                 'error': f'Студент {student.full_name} уже записан на курс "{course.name}"'
             })
         
-        # Создаем новую запись
-        enrollment = StudentCourseEnrollment.objects.create(
-            student=student,
-            course=course,
-            status='enrolled'
-        )
-        
         return JsonResponse({
             'success': True,
             'message': f'Студент {student.full_name} успешно записан на курс "{course.name}"',
@@ -11,6 +11,14 @@ import json
 import pickle
 from pathlib import Path
 
+try:
+    from numba import njit
+except ImportError:  # numba необязателен: без него пакетное обновление работает как обычная функция
+    def njit(*args, **kwargs):
+        def decorator(func):
+            return func
+        return decorator
+
 
 @dataclass
 class BKTParameters:
@@ -47,6 +55,58 @@ class BKTParameters:
         )
 
 
+# Параметры для навыков без обученных значений
+DEFAULT_BKT_PARAMETERS = BKTParameters(P_L0=0.1, P_T=0.3, P_G=0.2, P_S=0.1)
+
+
+def bkt_mastery_update(current_mastery: float, effective_correctness: float,
+                       p_t: float, p_g: float, p_s: float) -> float:
+    """
+    Новая вероятность освоения после ответа с эффективной правильностью effective_correctness.
+    Общая формула для BKTModel.update_student_state и пакетного BKTModel.batch_update
+    """
+    # Формула обновления по Байесу (модифицированная для небинарных оценок)
+    if effective_correctness > 0.5:
+        # P(L_t | correct) = P(L_{t-1}) * (1 - P_S) / [P(L_{t-1}) * (1 - P_S) + (1 - P(L_{t-1})) * P_G]
+        numerator = current_mastery * (1 - p_s * (1 - effective_correctness))
+        denominator = numerator + (1 - current_mastery) * p_g * effective_correctness
+    else:
+        # P(L_t | incorrect) = P(L_{t-1}) * P_S / [P(L_{t-1}) * P_S + (1 - P(L_{t-1})) * (1 - P_G)]
+        numerator = current_mastery * p_s * (1 - effective_correctness)
+        denominator = numerator + (1 - current_mastery) * (1 - p_g * effective_correctness)
+    
+    if denominator > 0:
+        updated_mastery = numerator / denominator
+    else:
+        updated_mastery = current_mastery
+    
+    # Применяем вероятность изучения
+    # P(L_t) = P(L_t | evidence) + (1 - P(L_t | evidence)) * P_T
+    new_mastery = updated_mastery + (1 - updated_mastery) * p_t
+    # Ограничиваем значения
+    return max(0.0, min(1.0, new_mastery))
+
+
+_bkt_mastery_update_jit = njit(cache=True)(bkt_mastery_update)
+
+
+@njit(cache=True)
+def _batch_update_kernel(student_idx, skill_idx, effective, mastery, p_t, p_g, p_s):
+    """
+    Последовательно применить bkt_mastery_update к событиям над плотными массивами.
+    Матрица mastery (студенты x навыки) обновляется на месте; возвращает
+    освоение навыка перед каждым событием
+    """
+    n = student_idx.shape[0]
+    before = np.empty(n, dtype=np.float64)
+    for i in range(n):
+        s = student_idx[i]
+        k = skill_idx[i]
+        before[i] = mastery[s, k]
+        mastery[s, k] = _bkt_mastery_update_jit(mastery[s, k], effective[i], p_t[k], p_g[k], p_s[k])
+    return before
+
+
 @dataclass
 class StudentSkillState:
     """Состояние освоения навыка студентом"""
@@ -183,7 +243,7 @@ class BKTModel:
             initial_mastery = params.P_L0
         else:
             # Используем значения по умолчанию
-            initial_mastery = 0.1
+            initial_mastery = DEFAULT_BKT_PARAMETERS.P_L0
         
         # Учитываем граф навыков (если доступен)
         if self.skills_graph and skill_id in self.skills_graph:
@@ -273,13 +333,13 @@ class BKTModel:
         
         if not params:
             # Используем параметры по умолчанию
-            params = BKTParameters(P_L0=0.1, P_T=0.3, P_G=0.2, P_S=0.1)
+            params = DEFAULT_BKT_PARAMETERS
         
         # Обрабатываем оценку в зависимости от типа задания
         if task_characteristics:
             processed_score = task_characteristics.process_answer_score(answer_score)
             answer_weight = task_characteristics.get_answer_weight()
-            adjusted_params = self._adjust_parameters_for_task(params, task_characteristics)
+            adjusted_params = self.adjust_parameters_for_task(params, task_characteristics)
         else:
             processed_score = 1.0 if answer_score > 0.5 else 0.0
             answer_weight = 1.0
@@ -292,35 +352,92 @@ class BKTModel:
             state.correct_attempts += processed_score * answer_weight
         
         # Обновляем вероятность освоения по формулам BKT с учетом веса ответа
-        current_mastery = state.current_mastery
-        
-        # Для небинарных оценок используем взвешенное обновление
+        # (для небинарных оценок используем взвешенное обновление)
         effective_correctness = processed_score * answer_weight
+        state.current_mastery = bkt_mastery_update(
+            state.current_mastery,
+            effective_correctness,
+            adjusted_params.P_T,
+            adjusted_params.P_G,
+            adjusted_params.P_S
+        )
         
-        # Формула обновления по Байесу (модифицированная для небинарных оценок)
-        if effective_correctness > 0.5:
-            # P(L_t | correct) = P(L_{t-1}) * (1 - P_S) / [P(L_{t-1}) * (1 - P_S) + (1 - P(L_{t-1})) * P_G]
-            numerator = current_mastery * (1 - adjusted_params.P_S * (1 - effective_correctness))
-            denominator = (current_mastery * (1 - adjusted_params.P_S * (1 - effective_correctness)) + 
-                          (1 - current_mastery) * adjusted_params.P_G * effective_correctness)
-        else:
-            # P(L_t | incorrect) = P(L_{t-1}) * P_S / [P(L_{t-1}) * P_S + (1 - P(L_{t-1})) * (1 - P_G)]
-            numerator = current_mastery * adjusted_params.P_S * (1 - effective_correctness)
-            denominator = (current_mastery * adjusted_params.P_S * (1 - effective_correctness) + 
-                          (1 - current_mastery) * (1 - adjusted_params.P_G * effective_correctness))
-        
-        if denominator > 0:
-            updated_mastery = numerator / denominator
-        else:
-            updated_mastery = current_mastery
+        return state
+    
+    def batch_update(
+        self,
+        student_ids: np.ndarray,
+        skill_ids: np.ndarray,
+        answer_scores: np.ndarray,
+        task_characteristics: Optional[TaskCharacteristics] = None
+    ) -> np.ndarray:
+        """
+        Обновить состояния студентов по последовательности попыток
         
-        # Применяем вероятность изучения
-        # P(L_t) = P(L_t | evidence) + (1 - P(L_t | evidence)) * P_T
-        new_mastery = updated_mastery + (1 - updated_mastery) * adjusted_params.P_T
-          # Ограничиваем значения
-        state.current_mastery = max(0.0, min(1.0, new_mastery))
+        Результат тот же, что у update_student_state для каждой попытки по порядку,
+        но формулы BKT применяются к плотным массивам (с numba - компилированным циклом).
+        Все студенты перед обновлением инициализируются по всем навыкам модели и попыток.
         
-        return state
+        Returns:
+            Массив освоения навыка перед каждой попыткой (предсказания)
+        """
+        n = len(student_ids)
+        
+        student_ids = np.asarray(student_ids).tolist()
+        skill_ids = np.asarray(skill_ids).tolist()
+        
+        # Плотные индексы студентов (в порядке появления) и навыков
+        student_list = list(dict.fromkeys(student_ids))
+        student_positions = {student_id: s for s, student_id in enumerate(student_list)}
+        student_idx = np.fromiter((student_positions[student_id] for student_id in student_ids), dtype=np.int64, count=n)
+        
+        skill_list = list(self.skill_parameters.keys())
+        skill_list += sorted(set(skill_ids) - set(skill_list))
+        skill_positions = {skill_id: k for k, skill_id in enumerate(skill_list)}
+        skill_idx = np.fromiter((skill_positions[skill_id] for skill_id in skill_ids), dtype=np.int64, count=n)
+        
+        # Инициализируем всех студентов и переносим текущее освоение в матрицу
+        mastery = np.empty((len(student_list), len(skill_list)), dtype=np.float64)
+        for s, student_id in enumerate(student_list):
+            self.initialize_student_all_skills(student_id, skill_list)
+            states = self.student_states[student_id]
+            mastery[s] = [states[skill_id].current_mastery for skill_id in skill_list]
+        
+        # Параметры навыков с поправкой на задание
+        p_t = np.empty(len(skill_list), dtype=np.float64)
+        p_g = np.empty(len(skill_list), dtype=np.float64)
+        p_s = np.empty(len(skill_list), dtype=np.float64)
+        for k, skill_id in enumerate(skill_list):
+            params = self.get_skill_parameters(skill_id) or DEFAULT_BKT_PARAMETERS
+            if task_characteristics:
+                params = self.adjust_parameters_for_task(params, task_characteristics)
+            p_t[k], p_g[k], p_s[k] = params.P_T, params.P_G, params.P_S
+        
+        # Эффективная правильность ответа, как в update_student_state
+        score_values, score_idx = np.unique(np.asarray(answer_scores, dtype=np.float64), return_inverse=True)
+        if task_characteristics:
+            processed = np.array(
+                [task_characteristics.process_answer_score(score) for score in score_values.tolist()]
+            )[score_idx]
+            effective = processed * task_characteristics.get_answer_weight()
+        else:
+            processed = (score_values > 0.5).astype(np.float64)[score_idx]
+            effective = processed
+        
+        predictions = _batch_update_kernel(student_idx, skill_idx, effective, mastery, p_t, p_g, p_s)
+        
+        # Возвращаем итоговые состояния и статистику попыток в модель
+        pairs = student_idx * len(skill_list) + skill_idx
+        attempts = np.bincount(pairs, minlength=mastery.size)
+        correct = np.bincount(pairs, weights=np.where(processed > 0.5, effective, 0.0), minlength=mastery.size)
+        for pair in np.flatnonzero(attempts).tolist():
+            s, k = divmod(pair, len(skill_list))
+            state = self.student_states[student_list[s]][skill_list[k]]
+            state.current_mastery = float(mastery[s, k])
+            state.attempts_count += int(attempts[pair])
+            state.correct_attempts += float(correct[pair])
+        
+        return predictions
     
     def predict_performance(
         self, 
@@ -339,11 +456,11 @@ class BKTModel:
         params = self.get_skill_parameters(skill_id)
         
         if not params:
-            params = BKTParameters(P_L0=0.1, P_T=0.3, P_G=0.2, P_S=0.1)
+            params = DEFAULT_BKT_PARAMETERS
         
         # Адаптируем параметры с учетом характеристик задания
         if task_characteristics:
-            adjusted_params = self._adjust_parameters_for_task(params, task_characteristics)
+            adjusted_params = self.adjust_parameters_for_task(params, task_characteristics)
         else:
             adjusted_params = params
         
@@ -353,7 +470,7 @@ class BKTModel:
         
         return p_correct
     
-    def _adjust_parameters_for_task(
+    def adjust_parameters_for_task(
         self, 
         params: BKTParameters, 
         task_characteristics: TaskCharacteristics
@@ -1,6 +1,10 @@
 """
 Оптимизация параметров BKT модели на синтетическом датасете
 Обучает модель методом EM и сохраняет оптимизированные параметры
+
+Необязательная зависимость: numba (pip install numba) компилирует пакетное
+обновление BKTModel.batch_update, которым выполняется валидация; без нее
+скрипт работает так же, только медленнее.
 """
 
 import os
@@ -16,17 +20,86 @@ django.setup()
 import pandas as pd
 import numpy as np
 import json
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional, Iterator, Sequence
 from datetime import datetime
-import pickle
+import joblib
+import hashlib
+import argparse
 from sklearn.model_selection import train_test_split
-from sklearn.metrics import accuracy_score, log_loss
+from sklearn.metrics import log_loss
 
-from mlmodels.bkt.base_model import BKTModel, BKTParameters, TaskCharacteristics
+from mlmodels.bkt.base_model import BKTModel, BKTParameters, TaskCharacteristics, DEFAULT_BKT_PARAMETERS
 from trainer import BKTTrainer, TrainingData
+from django.db.models import Prefetch
 from skills.models import Course, Skill
 from methodist.models import Task
 
+# Типы колонок датасета, чтобы pandas не выводил их заново при каждом чтении
+DATASET_DTYPES = {
+    'student_id': 'int32',
+    'task_id': 'int32',
+    'skill_id': 'int32',
+    'is_correct': 'bool'
+}
+
+# Оптимизатору нужны только эти колонки, остальные не разбираются вовсе
+DATASET_COLUMNS = ['student_id', 'task_id', 'skill_id', 'is_correct', 'timestamp']
+
+# Стандартные характеристики задания для валидации: детальной информации о заданиях нет
+DEFAULT_TASK_CHARACTERISTICS = TaskCharacteristics(task_type="single_choice", difficulty="medium")
+
+# Раскладка примера обучения в структурированном массиве (поля TrainingData).
+# Время хранится с точностью до микросекунд, как в исходном датасете
+TRAINING_RECORD_DTYPE = np.dtype([
+    ('student_id', 'i4'),
+    ('skill_id', 'i4'),
+    ('is_correct', '?'),
+    ('task_id', 'i4'),
+    ('timestamp', 'datetime64[us]')
+])
+
+# Шаблоны строк таблиц отчета об обучении
+SKILL_ROW_TEMPLATE = "| {} | {:.3f} | {:.3f} | {:.3f} | {:.3f} |\n"
+STATS_ROW_TEMPLATE = "| **{}** | {:.3f} | {:.3f} | {:.3f} | {:.3f} |"
+PARAM_LABELS = ('P(L0)', 'P(T)', 'P(G)', 'P(S)')
+
+
+class TrainingBatch(Sequence):
+    """
+    Примеры обучения в виде структурированного массива NumPy
+    
+    Хранит данные колонками вместо списка объектов TrainingData.
+    Объекты TrainingData создаются лениво - только при обращении к элементу,
+    поэтому батч можно передавать туда, где ожидается список примеров.
+    """
+    
+    def __init__(self, records: np.ndarray):
+        self.records = records
+    
+    def __len__(self) -> int:
+        return len(self.records)
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return TrainingBatch(self.records[index])
+        return self._to_training_data(self.records[index].item())
+    
+    def __iter__(self) -> Iterator[TrainingData]:
+        # tolist() за один вызов переводит все строки в кортежи питоновских значений
+        return map(self._to_training_data, self.records.tolist())
+    
+    @staticmethod
+    def _to_training_data(row: tuple) -> TrainingData:
+        student_id, skill_id, is_correct, task_id, timestamp = row
+        return TrainingData(
+            student_id=student_id,
+            skill_id=skill_id,
+            is_correct=is_correct,
+            task_id=task_id,
+            timestamp=timestamp
+        )
+
+
 class BKTOptimizer:
     """Класс для оптимизации параметров BKT модели"""
     
@@ -34,6 +107,7 @@ class BKTOptimizer:
         self.dataset_path = dataset_path
         self.bkt_model = BKTModel()
         self.trainer = BKTTrainer(self.bkt_model)
+        self._skills_graph_cache: Optional[Dict[int, List[int]]] = None
         
         print("🔧 Инициализация оптимизатора BKT модели")
         print(f"📂 Датасет: {dataset_path}")
@@ -42,7 +116,20 @@ class BKTOptimizer:
         """Загрузить датасет для обучения"""
         print("📊 Загрузка датасета...")
         
-        df = pd.read_csv(self.dataset_path)
+        csv_path = Path(self.dataset_path)
+        parquet_path = csv_path.with_suffix('.parquet')
+        
+        # Parquet-копия датасета читается на порядок быстрее CSV
+        if parquet_path.exists() and parquet_path.stat().st_mtime >= csv_path.stat().st_mtime:
+            df = pd.read_parquet(parquet_path)
+            print(f"⚡ Использован кэш: {parquet_path}")
+        else:
+            df = pd.read_csv(csv_path, usecols=DATASET_COLUMNS, dtype=DATASET_DTYPES)
+            try:
+                df.to_parquet(parquet_path, compression='zstd', index=False)
+            except ImportError:
+                # pyarrow/fastparquet не установлены - работаем без кэша
+                pass
         
         print(f"✅ Загружено записей: {len(df)}")
         print(f"   👥 Студентов: {df['student_id'].nunique()}")
@@ -52,48 +139,30 @@ class BKTOptimizer:
         
         return df
     
-    def prepare_training_data(self, df: pd.DataFrame) -> Tuple[List[Dict], List[Dict]]:
+    def prepare_training_data(self, df: pd.DataFrame) -> Tuple[TrainingBatch, TrainingBatch]:
         """Подготовить данные для обучения BKT"""
         print("🔄 Подготовка данных для обучения...")
         
         # Сортируем по студенту и времени для корректной последовательности
         df_sorted = df.sort_values(['student_id', 'timestamp'])
         
-        training_examples = []
-        validation_examples = []
-        
         # Разделяем данные по студентам на обучение (80%) и валидацию (20%)
         students = df['student_id'].unique()
         train_students, val_students = train_test_split(
             students, test_size=0.2, random_state=42
         )
-          # Подготавливаем примеры для обучения
-        for student_id in train_students:
-            student_data = df_sorted[df_sorted['student_id'] == student_id]
-            
-            for _, row in student_data.iterrows():
-                example = TrainingData(
-                    student_id=int(row['student_id']),
-                    skill_id=int(row['skill_id']),
-                    is_correct=bool(row['is_correct']),
-                    task_id=int(row['task_id']),
-                    timestamp=row['timestamp']
-                )
-                training_examples.append(example)
-        
-        # Подготавливаем примеры для валидации
-        for student_id in val_students:
-            student_data = df_sorted[df_sorted['student_id'] == student_id]
-            
-            for _, row in student_data.iterrows():
-                example = TrainingData(
-                    student_id=int(row['student_id']),
-                    skill_id=int(row['skill_id']),
-                    is_correct=bool(row['is_correct']),
-                    task_id=int(row['task_id']),
-                    timestamp=row['timestamp']
-                )
-                validation_examples.append(example)
+        
+        # Заполняем структурированный массив целыми колонками, без объекта на каждую строку
+        records = np.empty(len(df_sorted), dtype=TRAINING_RECORD_DTYPE)
+        for column in ('student_id', 'skill_id', 'is_correct', 'task_id'):
+            records[column] = df_sorted[column].to_numpy()
+        records['timestamp'] = pd.to_datetime(df_sorted['timestamp']).to_numpy()
+        
+        # Булева маска сохраняет порядок строк: примеры студента остаются
+        # непрерывным блоком, отсортированным по времени
+        is_train = np.isin(records['student_id'], train_students)
+        training_examples = TrainingBatch(records[is_train])
+        validation_examples = TrainingBatch(records[~is_train])
         
         print(f"✅ Подготовлено:")
         print(f"   🎓 Обучающих примеров: {len(training_examples)}")
@@ -105,14 +174,20 @@ class BKTOptimizer:
     
     def load_skills_graph(self) -> Dict[int, List[int]]:
         """Загрузить граф навыков из базы данных"""
-        print("🔗 Загрузка графа навыков...")
+        if self._skills_graph_cache is not None:
+            return self._skills_graph_cache
         
-        skills_graph = {}
-        skills = Skill.objects.all()
+        print("🔗 Загрузка графа навыков...")
         
-        for skill in skills:
-            prerequisites = list(skill.prerequisites.values_list('id', flat=True))
-            skills_graph[skill.id] = prerequisites
+        # prefetch_related: два запроса вместо отдельного запроса на каждый навык
+        skills = Skill.objects.only('id').prefetch_related(
+            Prefetch('prerequisites', queryset=Skill.objects.only('id'))
+        )
+        skills_graph = {
+            skill.id: [prereq.id for prereq in skill.prerequisites.all()]
+            for skill in skills
+        }
+        self._skills_graph_cache = skills_graph
             
         print(f"✅ Загружен граф из {len(skills_graph)} навыков")
         edges_count = sum(len(prereqs) for prereqs in skills_graph.values())
@@ -120,15 +195,15 @@ class BKTOptimizer:
         
         return skills_graph
     
-    def initialize_model_parameters(self, training_data: List[Dict]) -> Dict[int, BKTParameters]:
+    def initialize_model_parameters(self, training_data: TrainingBatch) -> Dict[int, BKTParameters]:
         """Инициализировать базовые параметры модели для каждого навыка"""
         print("⚙️ Инициализация параметров модели...")
           # Получаем уникальные навыки из данных
-        unique_skills = set(example.skill_id for example in training_data)
+        unique_skills = np.unique(training_data.records['skill_id']).tolist()
         
         # Базовые параметры для разных стратегий студентов
         base_parameters = {
-            'default': BKTParameters(P_L0=0.1, P_T=0.3, P_G=0.2, P_S=0.1)
+            'default': DEFAULT_BKT_PARAMETERS
         }
         
         skill_parameters = {}
@@ -138,7 +213,7 @@ class BKTOptimizer:
         print(f"✅ Инициализированы параметры для {len(skill_parameters)} навыков")
         return skill_parameters
     
-    def train_model(self, training_data: List[Dict], validation_data: List[Dict]) -> Dict:
+    def train_model(self, training_data: TrainingBatch, validation_data: TrainingBatch) -> Dict:
         """Обучить BKT модель методом EM"""
         print("🎯 ОБУЧЕНИЕ BKT МОДЕЛИ")
         print("=" * 50)
@@ -176,54 +251,40 @@ class BKTOptimizer:
         
         return results
     
-    def validate_model(self, validation_data: List[Dict]) -> Dict:
+    def validate_model(self, validation_data: TrainingBatch) -> Dict:
         """Валидировать модель на тестовых данных"""
-        predictions = []
-        actual = []
-        
-        # Инициализируем всех студентов
-        student_ids = set(example.student_id for example in validation_data)
-        skill_ids = list(self.bkt_model.skill_parameters.keys())
-        
-        for student_id in student_ids:
-            self.bkt_model.initialize_student_all_skills(student_id, skill_ids)
-        
-        for example in validation_data:
-            student_id = example.student_id
-            skill_id = example.skill_id
-            is_correct = example.is_correct
-            
-            # Получаем предсказание до обновления
-            prediction = self.bkt_model.get_student_mastery(student_id, skill_id)
-            predictions.append(prediction)
-            actual.append(1.0 if is_correct else 0.0)
-            
-            # Обновляем состояние студента
-            # Используем стандартные параметры задания, поскольку у нас нет детальной информации
-            task_chars = TaskCharacteristics(task_type="single_choice", difficulty="medium")
-            answer_score = 1.0 if is_correct else 0.0
-            self.bkt_model.update_student_state(
-                student_id, skill_id, answer_score, task_chars
-            )
+        n = len(validation_data)
+        
+        # Колонки структурированного массива (Struct-of-Arrays)
+        records = validation_data.records
+        actual = records['is_correct'].astype(np.float64)
+        
+        # Предсказание до обновления + последовательное обновление состояний модели
+        predictions = self.bkt_model.batch_update(
+            records['student_id'],
+            records['skill_id'],
+            actual,
+            DEFAULT_TASK_CHARACTERISTICS
+        )
         
         # Вычисляем метрики
         # Для accuracy преобразуем предсказания в бинарные (> 0.5)
-        binary_predictions = [1 if p > 0.5 else 0 for p in predictions]
-        binary_actual = [1 if a > 0.5 else 0 for a in actual]
+        binary_predictions = (predictions > 0.5).astype(np.int8)
+        binary_actual = (actual > 0.5).astype(np.int8)
         
-        accuracy = accuracy_score(binary_actual, binary_predictions)
+        accuracy = (binary_predictions == binary_actual).mean()
         
         # Для log-loss нужны вероятности
         # Ограничиваем предсказания чтобы избежать log(0)
-        clipped_predictions = [max(min(p, 0.999), 0.001) for p in predictions]
+        clipped_predictions = np.clip(predictions, 0.001, 0.999)
         logloss = log_loss(binary_actual, clipped_predictions)
         
         validation_results = {
             'accuracy': float(accuracy),
             'log_loss': float(logloss),
-            'num_examples': len(validation_data),
-            'mean_prediction': float(np.mean(predictions)),
-            'mean_actual': float(np.mean(actual))
+            'num_examples': n,
+            'mean_prediction': float(predictions.mean()),
+            'mean_actual': float(actual.mean())
         }
         
         print(f"✅ Результаты валидации:")
@@ -267,7 +328,8 @@ class BKTOptimizer:
                 'training_timestamp': results['training_timestamp'],
                 'model_type': 'BKT',
                 'optimization_method': 'EM',
-                'num_skills': len(results['model_parameters'])
+                'num_skills': len(results['model_parameters']),
+                'data_fingerprint': results.get('data_fingerprint')
             }
         }
         
@@ -276,10 +338,9 @@ class BKTOptimizer:
             json.dump(model_data, f, indent=2, ensure_ascii=False)
         files_created['model_json'] = str(json_path)
         
-        # 2. Сохраняем модель в pickle для быстрой загрузки
+        # 2. Сохраняем модель в сжатый pickle для быстрой загрузки (читать через joblib.load)
         pickle_path = output_path / "bkt_model_optimized.pkl"
-        with open(pickle_path, 'wb') as f:
-            pickle.dump(self.bkt_model, f)
+        joblib.dump(self.bkt_model, pickle_path, compress=('zlib', 3))
         files_created['model_pickle'] = str(pickle_path)
         
         # 3. Сохраняем детальные результаты обучения
@@ -340,15 +401,34 @@ class BKTOptimizer:
             reverse=True
         )
         
+        # Строки таблицы собираются списком и склеиваются одним join
+        rows = [
+            SKILL_ROW_TEMPLATE.format(skill_id, params['P_L0'], params['P_T'], params['P_G'], params['P_S'])
+            for skill_id, params in sorted_skills[:10]
+        ]
         report += "| Навык ID | P(L0) | P(T) | P(G) | P(S) |\n"
         report += "|----------|-------|------|------|------|\n"
-        
-        for skill_id, params in sorted_skills[:10]:
-            report += f"| {skill_id} | {params['P_L0']:.3f} | {params['P_T']:.3f} | {params['P_G']:.3f} | {params['P_S']:.3f} |\n"
+        report += "".join(rows)
         
         if len(sorted_skills) > 10:
             report += f"\n*... и еще {len(sorted_skills) - 10} навыков*\n"
         
+        # Матрица (навыки x [P_L0, P_T, P_G, P_S]) строится один раз для всех статистик
+        param_names = ('P_L0', 'P_T', 'P_G', 'P_S')
+        params_matrix = np.fromiter(
+            (p[name] for p in model_params.values() for name in param_names),
+            dtype=np.float64,
+            count=len(param_names) * len(model_params)
+        ).reshape(-1, len(param_names))
+        mins = params_matrix.min(axis=0)
+        maxs = params_matrix.max(axis=0)
+        means = params_matrix.mean(axis=0)
+        stds = params_matrix.std(axis=0)
+        stats_rows = "\n".join(
+            STATS_ROW_TEMPLATE.format(label, *values)
+            for label, values in zip(PARAM_LABELS, zip(mins, maxs, means, stds))
+        )
+        
         report += f"""
 ---
 
@@ -356,10 +436,7 @@ class BKTOptimizer:
 
 | Параметр | Минимум | Максимум | Среднее | Стд. отклонение |
 |----------|---------|----------|---------|-----------------|
-| **P(L0)** | {min(p['P_L0'] for p in model_params.values()):.3f} | {max(p['P_L0'] for p in model_params.values()):.3f} | {np.mean([p['P_L0'] for p in model_params.values()]):.3f} | {np.std([p['P_L0'] for p in model_params.values()]):.3f} |
-| **P(T)** | {min(p['P_T'] for p in model_params.values()):.3f} | {max(p['P_T'] for p in model_params.values()):.3f} | {np.mean([p['P_T'] for p in model_params.values()]):.3f} | {np.std([p['P_T'] for p in model_params.values()]):.3f} |
-| **P(G)** | {min(p['P_G'] for p in model_params.values()):.3f} | {max(p['P_G'] for p in model_params.values()):.3f} | {np.mean([p['P_G'] for p in model_params.values()]):.3f} | {np.std([p['P_G'] for p in model_params.values()]):.3f} |
-| **P(S)** | {min(p['P_S'] for p in model_params.values()):.3f} | {max(p['P_S'] for p in model_params.values()):.3f} | {np.mean([p['P_S'] for p in model_params.values()]):.3f} | {np.std([p['P_S'] for p in model_params.values()]):.3f} |
+{stats_rows}
 
 ---
 
@@ -382,11 +459,62 @@ class BKTOptimizer:
         
         return report
     
-    def optimize(self) -> Dict[str, str]:
-        """Полный цикл оптимизации модели"""
+    def dataset_fingerprint(self) -> str:
+        """
+        Отпечаток входных данных обучения для проверки актуальности сохраненной модели:
+        содержимое датасета и граф навыков из базы (train_model использует оба)
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        with open(self.dataset_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        
+        # Граф кэшируется в оптимизаторе, поэтому train_model повторно его не загружает
+        skills_graph = self.load_skills_graph()
+        graph_items = sorted((skill_id, sorted(prereqs)) for skill_id, prereqs in skills_graph.items())
+        digest.update(json.dumps(graph_items).encode())
+        return digest.hexdigest()
+    
+    def load_cached_model(self, fingerprint: str, output_dir: str = "optimized_bkt_model") -> Optional[Dict[str, str]]:
+        """Загрузить сохраненную модель, если она обучена на тех же данных"""
+        output_path = Path(output_dir)
+        files = {
+            'model_json': output_path / "bkt_model_optimized.json",
+            'model_pickle': output_path / "bkt_model_optimized.pkl",
+            'results': output_path / "training_results.json",
+            'report': output_path / "TRAINING_REPORT.md"
+        }
+        if not all(path.exists() for path in files.values()):
+            return None
+        
+        with open(files['model_json'], 'r', encoding='utf-8') as f:
+            metadata = json.load(f).get('metadata', {})
+        if metadata.get('data_fingerprint') != fingerprint:
+            return None
+        
+        self.bkt_model = joblib.load(files['model_pickle'])
+        self.trainer = BKTTrainer(self.bkt_model)
+        return {file_type: str(path) for file_type, path in files.items()}
+    
+    def optimize(self, force: bool = False) -> Dict[str, str]:
+        """
+        Полный цикл оптимизации модели
+        
+        Args:
+            force: Переобучить модель, даже если датасет и граф навыков не изменились
+        """
         print("🚀 ЗАПУСК ОПТИМИЗАЦИИ BKT МОДЕЛИ")
         print("=" * 60)
         
+        # 0. Пропускаем обучение, если модель уже обучена на этих данных
+        fingerprint = self.dataset_fingerprint()
+        if not force:
+            files = self.load_cached_model(fingerprint)
+            if files:
+                print("⚡ Датасет и граф навыков не изменились, используется сохраненная модель")
+                print("📂 Файлы: optimized_bkt_model/ (для переобучения используйте --force)")
+                return files
+        
         # 1. Загружаем данные
         df = self.load_dataset()
         
@@ -395,6 +523,7 @@ class BKTOptimizer:
         
         # 3. Обучаем модель
         results = self.train_model(training_data, validation_data)
+        results['data_fingerprint'] = fingerprint
         
         # 4. Сохраняем модель
         files = self.save_model(results)
@@ -407,6 +536,14 @@ class BKTOptimizer:
 
 def main():
     """Основная функция для оптимизации модели"""
+    parser = argparse.ArgumentParser(description="Оптимизация параметров BKT модели")
+    parser.add_argument(
+        '--force',
+        action='store_true',
+        help='Переобучить модель, даже если датасет и граф навыков не изменились'
+    )
+    args = parser.parse_args()
+    
     print("🔧 ОПТИМИЗАТОР ПАРАМЕТРОВ BKT МОДЕЛИ")
     print("=" * 60)
     
@@ -414,10 +551,10 @@ def main():
     optimizer = BKTOptimizer("bkt_training_data/bkt_training_dataset.csv")
     
     # Запускаем оптимизацию
-    files = optimizer.optimize()
+    files = optimizer.optimize(force=args.force)
     
     print(f"\n🎯 Оптимизированная модель готова к использованию!")
-    print(f"Загружайте модель из: {files['model_pickle']}")
+    print(f"Загружайте модель из: {files['model_pickle']} (joblib.load)")
 
 if __name__ == "__main__":
     main()
@@ -1,5 +1,8 @@
 from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from skills.models import Skill, Course
 from methodist.models import Task
 from student.models import StudentProfile
@@ -856,3 +859,23 @@ class DQNTrainingSession(models.Model):
         verbose_name = "Сессия обучения DQN"
         verbose_name_plural = "Сессии обучения DQN"
         ordering = ['-created_at']
+
+
+# Кэш ответов API по студенту (mlmodels.views): профиль, попытки, освоение навыков
+def student_api_cache_key(kind, student_id):
+    return f"mlmodels_{kind}_{student_id}"
+
+
+def invalidate_student_cache(student_id):
+    """Сбросить закэшированные ответы API для студента"""
+    cache.delete_many([
+        student_api_cache_key(kind, student_id)
+        for kind in ('profile', 'attempts', 'masteries')
+    ])
+
+
+@receiver([post_save, post_delete], sender=TaskAttempt)
+@receiver([post_save, post_delete], sender=StudentSkillMastery)
+def invalidate_student_api_cache(sender, instance, **kwargs):
+    """Новая попытка или пересчет BKT меняют данные, отдаваемые API по студенту"""
+    invalidate_student_cache(instance.student_id)
@@ -1,19 +1,30 @@
 from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.models import User
 from django.core.exceptions import ObjectDoesNotExist
+from django.core.cache import cache
 import json
-from typing import Dict, List, Any, Optional
+import logging
+from typing import Dict, List, Any, Optional, Tuple
 
 from student.models import StudentProfile
 from .models import TaskAttempt
 from skills.models import Skill, Course
 from methodist.models import Task
-from .models import StudentSkillMastery
+from .models import StudentSkillMastery, invalidate_student_cache, student_api_cache_key
 from .bkt.base_model import BKTModel, BKTParameters, TaskCharacteristics
 
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:  # orjson необязателен (pip install orjson), без него используются стандартные json и JsonResponse
+    orjson = None
+    json_loads = json.loads
+
+logger = logging.getLogger(__name__)
+
 
 class MLModelsAPI:
     """
@@ -37,12 +48,12 @@ class MLModelsAPI:
             
             if os.path.exists(optimized_model_path):
                 self.bkt_model.load_model(optimized_model_path)
-                print(f"✅ Загружены оптимизированные параметры BKT модели")
+                logger.debug("Загружены оптимизированные параметры BKT модели")
             else:
-                print("⚠️ Оптимизированные параметры не найдены, используются параметры по умолчанию")
+                logger.warning("Оптимизированные параметры не найдены, используются параметры по умолчанию")
                 
         except Exception as e:
-            print(f"❌ Ошибка загрузки оптимизированных параметров: {e}")
+            logger.error("Ошибка загрузки оптимизированных параметров: %s", e)
     
     def get_student_by_id(self, student_id: int) -> Optional[Dict[str, Any]]:
         """
@@ -54,10 +65,14 @@ class MLModelsAPI:
         Returns:
             Dict с информацией о студенте или None если не найден
         """
+        return self._load_student(student_id)[0]
+    
+    def _load_student(self, student_id: int) -> Tuple[Optional[Dict[str, Any]], bool]:
+        """Студент и признак успешной загрузки (отсутствие студента - не ошибка)"""
         try:
             student_profile = StudentProfile.objects.select_related('user').get(pk=student_id)
             
-            return {
+            return ({
                 'id': student_profile.id,
                 'user_id': student_profile.user.id,
                 'username': student_profile.user.username,
@@ -69,13 +84,13 @@ class MLModelsAPI:
                 'skill_level': student_profile.skill_level,
                 'created_at': student_profile.created_at.isoformat(),
                 'updated_at': student_profile.updated_at.isoformat()
-            }
+            }, True)
             
         except StudentProfile.DoesNotExist:
-            return None
+            return None, True
         except Exception as e:
-            print(f"Ошибка получения студента {student_id}: {e}")
-            return None
+            logger.error("Ошибка получения студента %s: %s", student_id, e)
+            return None, False
     
     def get_student_task_attempts(self, student_id: int) -> List[Dict[str, Any]]:
         """
@@ -87,6 +102,10 @@ class MLModelsAPI:
         Returns:
             List попыток с подробной информацией
         """
+        return self._load_task_attempts(student_id)[0]
+    
+    def _load_task_attempts(self, student_id: int) -> Tuple[List[Dict[str, Any]], bool]:
+        """Попытки студента и признак успешной загрузки"""
         try:
             attempts = TaskAttempt.objects.filter(
                 student_id=student_id
@@ -129,11 +148,11 @@ class MLModelsAPI:
                 }
                 attempts_data.append(attempt_data)
             
-            return attempts_data
+            return attempts_data, True
             
         except Exception as e:
-            print(f"Ошибка получения попыток студента {student_id}: {e}")
-            return []
+            logger.error("Ошибка получения попыток студента %s: %s", student_id, e)
+            return [], False
     
     def get_student_skill_masteries(self, student_id: int) -> Dict[int, Dict[str, Any]]:
         """
@@ -145,6 +164,10 @@ class MLModelsAPI:
         Returns:
             Dict с информацией об освоении навыков {skill_id: mastery_info}
         """
+        return self._load_skill_masteries(student_id)[0]
+    
+    def _load_skill_masteries(self, student_id: int) -> Tuple[Dict[int, Dict[str, Any]], bool]:
+        """Освоение навыков студентом и признак успешной загрузки"""
         try:
             masteries = StudentSkillMastery.objects.filter(
                 student_id=student_id
@@ -189,11 +212,11 @@ class MLModelsAPI:
                 
                 skill_masteries[mastery.skill.id] = mastery_info
             
-            return skill_masteries
+            return skill_masteries, True
             
         except Exception as e:
-            print(f"Ошибка получения освоения навыков студента {student_id}: {e}")
-            return {}
+            logger.error("Ошибка получения освоения навыков студента %s: %s", student_id, e)
+            return {}, False
     
     def get_student_full_profile(self, student_id: int) -> Dict[str, Any]:
         """
@@ -205,12 +228,16 @@ class MLModelsAPI:
         Returns:
             Dict с полной информацией о студенте
         """
-        student_info = self.get_student_by_id(student_id)
+        return self._load_full_profile(student_id)[0]
+    
+    def _load_full_profile(self, student_id: int) -> Tuple[Dict[str, Any], bool]:
+        """Полный профиль студента и признак того, что все его части загрузились без ошибок"""
+        student_info = self._load_student(student_id)[0]
         if not student_info:
-            return {'error': f'Студент с ID {student_id} не найден'}
+            return {'error': f'Студент с ID {student_id} не найден'}, False
         
-        attempts = self.get_student_task_attempts(student_id)
-        skill_masteries = self.get_student_skill_masteries(student_id)
+        attempts, attempts_ok = self._load_task_attempts(student_id)
+        skill_masteries, masteries_ok = self._load_skill_masteries(student_id)
         
         # Статистика
         total_attempts = len(attempts)
@@ -228,7 +255,7 @@ class MLModelsAPI:
             'attempts': attempts,
             'skill_masteries': skill_masteries,
             'bkt_model_summary': self.bkt_model.get_model_summary()
-        }
+        }, attempts_ok and masteries_ok
     
     def update_student_progress(self, student_id: int, task_id: int, score: float, max_score: float) -> Dict[str, Any]:
         """
@@ -267,21 +294,22 @@ class MLModelsAPI:
             )
             
             # Обновляем базу данных
-            mastery, created = StudentSkillMastery.objects.get_or_create(
+            progress = {
+                'current_mastery_prob': updated_state.current_mastery,
+                'attempts_count': updated_state.attempts_count,
+                'correct_attempts': updated_state.correct_attempts
+            }
+            StudentSkillMastery.objects.update_or_create(
                 student_id=student_id,
                 skill_id=skill_id,
-                defaults={
-                    'initial_mastery_prob': updated_state.current_mastery,
-                    'current_mastery_prob': updated_state.current_mastery
+                defaults=progress,
+                # P(L0) фиксируется только при создании записи
+                create_defaults={
+                    **progress,
+                    'initial_mastery_prob': updated_state.current_mastery
                 }
             )
             
-            if not created:
-                mastery.current_mastery_prob = updated_state.current_mastery
-                mastery.attempts_count = updated_state.attempts_count
-                mastery.correct_attempts = updated_state.correct_attempts
-                mastery.save()
-            
             return {
                 'success': True,
                 'student_id': student_id,
@@ -300,45 +328,65 @@ class MLModelsAPI:
 # Создаем глобальный экземпляр API
 ml_api = MLModelsAPI()
 
+# Время жизни кэша ответов API (сек): данные меняются только после новых попыток
+API_CACHE_TIMEOUT = 60
+
+
+def json_response(data: Any, status: int = 200) -> HttpResponse:
+    """JSON-ответ, сериализованный через orjson, если он установлен"""
+    if orjson is None:
+        return JsonResponse(data, status=status, safe=False)
+    
+    content = orjson.dumps(
+        data,
+        option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NAIVE_UTC
+    )
+    return HttpResponse(content, status=status, content_type='application/json')
+
+
+def _get_cached_student_data(kind: str, student_id: int, loader):
+    """
+    Данные студента из кэша API; loader возвращает (data, ok).
+    Неудачная загрузка (ошибка или студент не найден) отдается как есть, но не кэшируется.
+    """
+    key = student_api_cache_key(kind, student_id)
+    data = cache.get(key)
+    if data is None:
+        data, ok = loader(student_id)
+        if ok:
+            cache.set(key, data, API_CACHE_TIMEOUT)
+    return data
+
 
 # Django Views для HTTP API
 @require_http_methods(["GET"])
 def get_student_profile(request, student_id):
     """API endpoint для получения профиля студента"""
     try:
-        student_id = int(student_id)
-        profile = ml_api.get_student_full_profile(student_id)
-        return JsonResponse(profile, safe=False)
-    except ValueError:
-        return JsonResponse({'error': 'Неверный ID студента'}, status=400)
+        profile = _get_cached_student_data('profile', student_id, ml_api._load_full_profile)
+        return json_response(profile)
     except Exception as e:
-        return JsonResponse({'error': str(e)}, status=500)
+        return json_response({'error': str(e)}, status=500)
 
 
 @require_http_methods(["GET"])
 def get_student_attempts(request, student_id):
     """API endpoint для получения попыток студента"""
     try:
-        student_id = int(student_id)
-        attempts = ml_api.get_student_task_attempts(student_id)
-        return JsonResponse({'attempts': attempts}, safe=False)
-    except ValueError:
-        return JsonResponse({'error': 'Неверный ID студента'}, status=400)
+        attempts = _get_cached_student_data('attempts', student_id, ml_api._load_task_attempts)
+        return json_response({'attempts': attempts})
     except Exception as e:
-        return JsonResponse({'error': str(e)}, status=500)
+        return json_response({'error': str(e)}, status=500)
 
 
 @require_http_methods(["GET"])
 def get_student_masteries(request, student_id):
     """API endpoint для получения освоения навыков студентом"""
     try:
-        student_id = int(student_id)
-        masteries = ml_api.get_student_skill_masteries(student_id)
-        return JsonResponse({'masteries': masteries}, safe=False)
-    except ValueError:
-        return JsonResponse({'error': 'Неверный ID студента'}, status=400)
+        masteries = _get_cached_student_data('masteries', student_id, ml_api._load_skill_masteries)
+        return json_response({'masteries': masteries})
     except Exception as e:
-        return JsonResponse({'error': str(e)}, status=500)
+        return json_response({'error': str(e)}, status=500)
 
 
 @csrf_exempt
@@ -346,12 +394,12 @@ def get_student_masteries(request, student_id):
 def update_student_progress(request):
     """API endpoint для обновления прогресса студента"""
     try:
-        data = json.loads(request.body)
+        data = json_loads(request.body)
         
         required_fields = ['student_id', 'task_id', 'score', 'max_score']
         for field in required_fields:
             if field not in data:
-                return JsonResponse({'error': f'Отсутствует поле: {field}'}, status=400)
+                return json_response({'error': f'Отсутствует поле: {field}'}, status=400)
         
         result = ml_api.update_student_progress(
             student_id=int(data['student_id']),
@@ -361,13 +409,14 @@ def update_student_progress(request):
         )
         
         if 'error' in result:
-            return JsonResponse(result, status=400)
+            return json_response(result, status=400)
         
-        return JsonResponse(result)
+        invalidate_student_cache(result['student_id'])
+        return json_response(result)
         
     except json.JSONDecodeError:
-        return JsonResponse({'error': 'Неверный JSON'}, status=400)
+        return json_response({'error': 'Неверный JSON'}, status=400)
     except (ValueError, TypeError) as e:
-        return JsonResponse({'error': f'Неверные типы данных: {str(e)}'}, status=400)
+        return json_response({'error': f'Неверные типы данных: {str(e)}'}, status=400)
     except Exception as e:
-        return JsonResponse({'error': str(e)}, status=500)
+        return json_response({'error': str(e)}, status=500)
@@ -12,3 +12,6 @@ class SkillAdmin(admin.ModelAdmin):
     list_filter = ['is_base', 'courses']
     search_fields = ['name', 'description']
     filter_horizontal = ['courses', 'prerequisites']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related('courses', 'prerequisites')
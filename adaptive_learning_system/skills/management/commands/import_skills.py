@@ -1,7 +1,11 @@
 import re
 import os
 from django.core.management.base import BaseCommand
-from skills.models import Skill, Course
+from skills.models import Skill, Course, bump_skills_version
+
+# Регулярные выражения DOT-файла компилируются один раз при импорте модуля
+SKILL_PATTERN = re.compile(r'"([^"]+)";')
+DEPENDENCY_PATTERN = re.compile(r'"([^"]+)" -> "([^"]+)"')
 
 class Command(BaseCommand):
     help = 'Импорт навыков и зависимостей из DOT-файла'
@@ -61,8 +65,7 @@ class Command(BaseCommand):
             self.stdout.write(f"{'Создан' if created else 'Обновлен'} курс: {course_obj.name}")
         
         # Извлекаем имена навыков из файла
-        skill_pattern = re.compile(r'"([^"]+)";')
-        skill_names = skill_pattern.findall(dot_content)
+        skill_names = SKILL_PATTERN.findall(dot_content)
         
         # Определяем базовые навыки
         base_skills = [
@@ -128,14 +131,24 @@ class Command(BaseCommand):
                     skill_objects[base_skill_name].courses.add(course_objects[course_id])
         
         # Извлечение зависимостей
-        dependency_pattern = re.compile(r'"([^"]+)" -> "([^"]+)"')
-        dependencies = dependency_pattern.findall(dot_content)
+        dependencies = DEPENDENCY_PATTERN.findall(dot_content)
         
         # Создаем зависимости между навыками
+        # Строки промежуточной таблицы собираются по id и вставляются одним запросом:
+        # from_skill - зависимый навык, to_skill - его предпосылка
         self.stdout.write("Создаем зависимости между навыками...")
+        SkillPrerequisite = Skill.prerequisites.through
+        prerequisite_links = []
         for prereq_name, skill_name in dependencies:
             if prereq_name in skill_objects and skill_name in skill_objects:
-                skill_objects[skill_name].prerequisites.add(skill_objects[prereq_name])
+                prerequisite_links.append(SkillPrerequisite(
+                    from_skill_id=skill_objects[skill_name].id,
+                    to_skill_id=skill_objects[prereq_name].id
+                ))
                 self.stdout.write(f"Добавлена зависимость: {prereq_name} -> {skill_name}")
+        SkillPrerequisite.objects.bulk_create(prerequisite_links, ignore_conflicts=True)
+        
+        # bulk_create не отправляет сигналы моделей - сбрасываем кэш графов явно
+        bump_skills_version()
         
         self.stdout.write(self.style.SUCCESS("Импорт данных завершен успешно!"))
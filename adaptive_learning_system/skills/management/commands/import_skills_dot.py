@@ -1,7 +1,14 @@
 import re
 import os
+import mmap
 from django.core.management.base import BaseCommand
-from skills.models import Skill, Course
+from django.db import transaction
+from skills.models import Skill, Course, bump_skills_version
+
+# Одно регулярное выражение для узлов ("навык";) и ребер ("пререквизит" -> "навык").
+# Ребро, закрытое ";", одновременно объявляет целевой навык - как и раньше,
+# когда узлы и ребра искались двумя отдельными проходами
+DOT_PATTERN = re.compile(rb'"([^"]+)" -> "([^"]+)"(;)?|"([^"]+)";')
 
 class Command(BaseCommand):
     help = 'Импорт навыков и зависимостей из DOT-файла'
@@ -17,6 +24,32 @@ class Command(BaseCommand):
         
         self.import_skills_from_dot(file_path)
 
+    def parse_dot_file(self, dot_file_path):
+        """
+        Извлекает имена навыков и зависимости из DOT-файла за один проход.
+        Файл отображается в память (mmap) и разбирается байтовым регулярным
+        выражением без чтения в строку; в UTF-8 декодируются только найденные имена
+        """
+        skill_names = set()
+        dependencies = []
+        
+        with open(dot_file_path, 'rb') as file:
+            # mmap не создается для пустого файла
+            if os.fstat(file.fileno()).st_size == 0:
+                return skill_names, dependencies
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as dot_content:
+                for match in DOT_PATTERN.finditer(dot_content):
+                    prereq_name, skill_name, closed, node_name = match.groups()
+                    if node_name is not None:
+                        skill_names.add(node_name.decode('utf-8'))
+                        continue
+                    skill_name = skill_name.decode('utf-8')
+                    dependencies.append((prereq_name.decode('utf-8'), skill_name))
+                    if closed:
+                        skill_names.add(skill_name)
+        
+        return skill_names, dependencies
+
     def import_skills_from_dot(self, dot_file_path):
         """Импортирует навыки и зависимости из DOT-файла"""
         self.stdout.write(f"Начинаем импорт из файла: {dot_file_path}")
@@ -27,8 +60,7 @@ class Command(BaseCommand):
             return
         
         # Чтение DOT-файла
-        with open(dot_file_path, 'r', encoding='utf-8') as file:
-            dot_content = file.read()
+        skill_names, dependencies = self.parse_dot_file(dot_file_path)
         
         # Создаем курсы
         self.stdout.write("Создаем курсы...")
@@ -60,10 +92,6 @@ class Command(BaseCommand):
             course_objects[course_id] = course_obj
             self.stdout.write(f"{'Создан' if created else 'Обновлен'} курс: {course_obj.name}")
         
-        # Извлекаем имена навыков из файла
-        skill_pattern = re.compile(r'"([^"]+)";')
-        skill_names = skill_pattern.findall(dot_content)
-        
         # Определяем базовые навыки
         base_skills = [
             "Переменные и типы данных", "Операторы и выражения", "Условные операторы",
@@ -92,50 +120,78 @@ class Command(BaseCommand):
             ]
         }
         
-        # Создаем навыки в базе данных
-        skill_objects = {}
-        
-        # Создаем или обновляем базовые навыки
-        self.stdout.write("Создаем базовые навыки...")
-        for skill_name in base_skills:
-            if skill_name in skill_names:
-                skill_obj, created = Skill.objects.update_or_create(
-                    name=skill_name,
-                    defaults={"is_base": True}
-                )
-                skill_objects[skill_name] = skill_obj
-                self.stdout.write(f"{'Создан' if created else 'Обновлен'} базовый навык: {skill_name}")
-        
-        # Создаем или обновляем специфические навыки для каждого курса
-        self.stdout.write("Создаем специфические навыки по курсам...")
+        # Итоговый признак базового навыка: навык курса перекрывает базовый,
+        # как при последовательном update_or_create
+        skill_is_base = {name: True for name in base_skills if name in skill_names}
         for course_id, skills_list in course_specific_skills.items():
             for skill_name in skills_list:
                 if skill_name in skill_names:
-                    skill_obj, created = Skill.objects.update_or_create(
-                        name=skill_name,
-                        defaults={"is_base": False}
-                    )
-                    # Добавляем связь с курсом
-                    skill_obj.courses.add(course_objects[course_id])
-                    skill_objects[skill_name] = skill_obj
-                    self.stdout.write(f"{'Создан' if created else 'Обновлен'} навык курса {course_id}: {skill_name}")
-        
-        # Также добавляем базовые навыки во все курсы
-        self.stdout.write("Связываем базовые навыки с курсами...")
-        for base_skill_name in base_skills:
-            if base_skill_name in skill_objects:
-                for course_id in courses.keys():
-                    skill_objects[base_skill_name].courses.add(course_objects[course_id])
-        
-        # Извлечение зависимостей
-        dependency_pattern = re.compile(r'"([^"]+)" -> "([^"]+)"')
-        dependencies = dependency_pattern.findall(dot_content)
+                    skill_is_base[skill_name] = False
         
-        # Создаем зависимости между навыками
-        self.stdout.write("Создаем зависимости между навыками...")
-        for prereq_name, skill_name in dependencies:
-            if prereq_name in skill_objects and skill_name in skill_objects:
-                skill_objects[skill_name].prerequisites.add(skill_objects[prereq_name])
-                self.stdout.write(f"Добавлена зависимость: {prereq_name} -> {skill_name}")
+        with transaction.atomic():
+            # Один запрос на существующие навыки вместо запроса на каждый навык
+            existing_names = set(
+                Skill.objects.filter(name__in=skill_is_base).values_list('name', flat=True)
+            )
+            
+            # Создаем или обновляем все навыки одним запросом
+            self.stdout.write("Создаем навыки...")
+            Skill.objects.bulk_create(
+                [Skill(name=name, is_base=is_base) for name, is_base in skill_is_base.items()],
+                update_conflicts=True,
+                update_fields=['is_base'],
+                unique_fields=['name']
+            )
+            for skill_name in base_skills:
+                if skill_name in skill_names:
+                    action = 'Обновлен' if skill_name in existing_names else 'Создан'
+                    self.stdout.write(f"{action} базовый навык: {skill_name}")
+            for course_id, skills_list in course_specific_skills.items():
+                for skill_name in skills_list:
+                    if skill_name in skill_names:
+                        action = 'Обновлен' if skill_name in existing_names else 'Создан'
+                        self.stdout.write(f"{action} навык курса {course_id}: {skill_name}")
+            
+            # bulk_create с update_conflicts не возвращает id на всех СУБД - перечитываем
+            # только соответствие имя -> id, сами объекты навыков дальше не нужны
+            skill_ids = dict(
+                Skill.objects.filter(name__in=skill_is_base).values_list('name', 'id')
+            )
+            
+            # Связи с курсами: навыки курса - со своим курсом, базовые - со всеми курсами
+            self.stdout.write("Связываем навыки с курсами...")
+            skill_course_pairs = {
+                (skill_ids[skill_name], course_id)
+                for course_id, skills_list in course_specific_skills.items()
+                for skill_name in skills_list
+                if skill_name in skill_ids
+            }
+            skill_course_pairs.update(
+                (skill_ids[skill_name], course_id)
+                for skill_name in base_skills
+                if skill_name in skill_ids
+                for course_id in course_objects
+            )
+            SkillCourse = Skill.courses.through
+            SkillCourse.objects.bulk_create(
+                [SkillCourse(skill_id=skill_id, course_id=course_id) for skill_id, course_id in skill_course_pairs],
+                ignore_conflicts=True
+            )
+            
+            # Создаем зависимости между навыками
+            self.stdout.write("Создаем зависимости между навыками...")
+            SkillPrerequisite = Skill.prerequisites.through
+            prerequisite_links = []
+            for prereq_name, skill_name in dependencies:
+                if prereq_name in skill_ids and skill_name in skill_ids:
+                    prerequisite_links.append(SkillPrerequisite(
+                        from_skill_id=skill_ids[skill_name],
+                        to_skill_id=skill_ids[prereq_name]
+                    ))
+                    self.stdout.write(f"Добавлена зависимость: {prereq_name} -> {skill_name}")
+            SkillPrerequisite.objects.bulk_create(prerequisite_links, ignore_conflicts=True)
+        
+        # bulk_create не отправляет сигналы моделей - сбрасываем кэш графов явно
+        bump_skills_version()
         
         self.stdout.write(self.style.SUCCESS("Импорт данных завершен успешно!"))
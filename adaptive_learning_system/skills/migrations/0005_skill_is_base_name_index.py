@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-18 08:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('skills', '0004_course_duration_hours'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='skill',
+            index=models.Index(fields=['is_base', 'name'], name='skills_skill_base_name_idx'),
+        ),
+    ]
@@ -1,4 +1,10 @@
+from django.core.cache import caches
 from django.db import models
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+# Счетчик правок навыков в общем для всех процессов кэше (settings.CACHES['shared'])
+SKILLS_VERSION_KEY = 'skills_version'
 
 class Course(models.Model):
     """Модель курса"""
@@ -29,3 +35,36 @@ class Skill(models.Model):
         verbose_name = "Навык"
         verbose_name_plural = "Навыки"
         ordering = ["name"]
+        # Выборка базовых/прикладных навыков сразу в порядке сортировки.
+        # Отдельный индекс по name не нужен: его дает unique=True, а промежуточные
+        # таблицы M2M уже индексированы уникальной парой и внешними ключами
+        indexes = [
+            models.Index(fields=["is_base", "name"], name="skills_skill_base_name_idx"),
+        ]
+
+
+def get_skills_version():
+    """Текущая версия данных навыков для ключей кэша графов (одно чтение из общего кэша)"""
+    return caches['shared'].get(SKILLS_VERSION_KEY, 0)
+
+
+def bump_skills_version():
+    """Сбросить закэшированные графы навыков во всех процессах, увеличив общий счетчик"""
+    shared_cache = caches['shared']
+    try:
+        shared_cache.incr(SKILLS_VERSION_KEY)
+    except ValueError:
+        shared_cache.set(SKILLS_VERSION_KEY, 1, None)
+
+
+@receiver([post_save, post_delete], sender=Skill)
+@receiver(post_delete, sender=Course)
+def skills_changed(sender, **kwargs):
+    bump_skills_version()
+
+
+@receiver(m2m_changed, sender=Skill.courses.through)
+@receiver(m2m_changed, sender=Skill.prerequisites.through)
+def skill_relations_changed(sender, action, **kwargs):
+    if action.startswith('post_'):
+        bump_skills_version()
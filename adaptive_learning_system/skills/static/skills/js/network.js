@@ -14,12 +14,12 @@ function initializeSkillNetwork(graphData) {
     // Преобразуем данные из формата Cytoscape в формат Vis.js
     graphData.nodes.forEach(function(node, idx) {
         const isBase = node.data.is_base;
-        const isSelected = node.data.skill_id === parseInt(document.getElementById('selected-skill-id').textContent);
+        const isSelected = node.data.id === parseInt(document.getElementById('selected-skill-id').textContent);
         nodesArray.push({
             id: node.data.id,
             label: node.data.name,
             title: node.data.name,
-            skillId: node.data.skill_id,
+            skillId: node.data.id,
             isBase: isBase,
             shape: 'box',
             color: {
@@ -42,7 +42,7 @@ document.addEventListener('DOMContentLoaded', function() {
             id: node.data.id,
             label: node.data.name,
             title: node.data.name,
-            skillId: node.data.skill_id,
+            skillId: node.data.id,
             isBase: isBase,
             shape: 'box', // Все узлы - прямоугольники
             color: {
@@ -413,7 +413,7 @@ document.addEventListener('DOMContentLoaded', function() {
             
             if (node) {
                 // Получаем ID навыка из ID узла
-                const skillId = node.skillId || nodeId.replace('skill_', '');
+                const skillId = node.skillId;
                 
                 // Проверяем, был ли повторный клик по тому же узлу
                 const currentSelected = document.getElementById('selected-skill-id').textContent;
@@ -474,7 +474,7 @@ document.addEventListener('DOMContentLoaded', function() {
     const currentCourse = document.getElementById('course').value;
     
     if (selectedSkillId && nodesArray.length > 0) {
-        const nodeId = 'skill_' + selectedSkillId;
+        const nodeId = parseInt(selectedSkillId, 10);
         // Проверяем наличие узла
         const nodeExists = nodesArray.some(node => node.id === nodeId);
         
@@ -595,7 +595,7 @@ document.addEventListener('DOMContentLoaded', function() {
             // Получаем параметр из URL
             const url = new URL(window.location.href);
             const skillId = url.searchParams.get('skill');
-            const nodeId = skillId ? 'skill_' + skillId : '';
+            const nodeId = skillId ? parseInt(skillId, 10) : '';
             const node = nodeId ? nodes.get(nodeId) : null;
             
             if (node) {
@@ -1,38 +1,112 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import JsonResponse, HttpResponseForbidden
-from django.db.models import Prefetch, Q
+from django.http import JsonResponse, HttpResponseForbidden, Http404
+from django.db import DatabaseError
+from django.db.models import Count, Prefetch, Q, prefetch_related_objects
 from django.contrib import messages
 from django.views.decorators.http import require_POST
 from django.views.decorators.csrf import csrf_exempt
 from django.core.serializers.json import DjangoJSONEncoder
 from django.contrib.auth.decorators import login_required
-from .models import Skill, Course
+from django.core.cache import cache
+from .models import Skill, Course, bump_skills_version, get_skills_version
 import json
 import datetime
+import hashlib
+import logging
 
-@login_required
-def skills_list(request):
+try:
+    import orjson
+except ImportError:  # orjson необязателен, без него используется стандартный json
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# Время жизни закэшированного графа навыков (секунды); при изменении навыков
+# кэш сбрасывается раньше через версию данных
+SKILLS_GRAPH_CACHE_TIMEOUT = 60 * 60
+
+# CSS-классы узлов графа, индексируются значением is_base
+SKILL_NODE_CLASSES = ("regular-skill", "base-skill")
+JSON_BOOLEANS = ("false", "true")
+
+# Форма узлов и ребер графа фиксирована, поэтому JSON собирается по шаблонам
+# без создания словаря на каждый элемент; экранируется только название навыка
+SKILL_NODE_JSON = '{"data":{"id":%d,"name":%s,"is_base":%s},"classes":"%s"}'
+SKILL_EDGE_JSON = '{"data":{"id":"%d-%d","source":%d,"target":%d}}'
+
+
+def dumps_json(data):
+    """Сериализует данные графа в JSON-строку (через orjson, если он установлен)"""
+    if orjson is not None:
+        return orjson.dumps(data).decode()
+    return json.dumps(data)
+
+
+def cytoscape_node(skill):
+    """Узел графа Cytoscape.js для навыка - готовый JSON-фрагмент без промежуточных словарей"""
+    return SKILL_NODE_JSON % (
+        skill.id,
+        json.dumps(skill.name, ensure_ascii=False),
+        JSON_BOOLEANS[skill.is_base],
+        SKILL_NODE_CLASSES[skill.is_base]
+    )
+
+
+def cytoscape_edge(source_id, target_id):
+    """Ребро графа Cytoscape.js от навыка-предпосылки к зависимому навыку (JSON-фрагмент)"""
+    return SKILL_EDGE_JSON % (source_id, target_id, source_id, target_id)
+
+
+def cytoscape_graph(nodes, edges):
+    """Собирает JSON графа из готовых фрагментов узлов и ребер"""
+    return '{"nodes":[' + ','.join(nodes) + '],"edges":[' + ','.join(edges) + ']}'
+
+
+def dependent_skills_prefetch():
+    """Предзагрузка зависимых навыков - нужна только для графа выбранного навыка"""
+    return Prefetch('dependent_skills', queryset=Skill.objects.only('id', 'name', 'is_base'))
+
+
+def skills_graph_queryset(queryset=None, with_dependents=False):
     """
-    Отображает список всех навыков с группировкой по курсам, поддерживает фильтрацию графа по курсу
+    Навыки с предзагруженными прямыми связями для построения графа.
+    Связи загружаются фиксированным числом запросов независимо от размера графа
+    """
+    if queryset is None:
+        queryset = Skill.objects.all()
+    lookups = [Prefetch('prerequisites', queryset=Skill.objects.only('id', 'name', 'is_base'))]
+    if with_dependents:
+        lookups.append(dependent_skills_prefetch())
+    return queryset.only('id', 'name', 'is_base').prefetch_related(*lookups)
+
+
+def skills_graph_cache_key(course_id, selected_skill_id):
+    """Ключ кэша графа: параметры запроса и текущая версия данных навыков"""
+    params = hashlib.md5(f"{course_id}:{selected_skill_id}".encode()).hexdigest()
+    return f"skills_graph_{get_skills_version()}_{params}"
+
+
+def build_skills_list_graph(course_id, selected_skill_id, all_skills):
+    """
+    Строит данные графа для страницы списка навыков.
+    all_skills - queryset всех навыков страницы, переиспользуется для графа без курса.
+    Возвращает JSON графа и признак принадлежности выбранного навыка курсу.
+    Ошибки БД при загрузке навыков пробрасываются, чтобы граф с ошибкой не попал в кэш
     """
-    course_id = request.GET.get('course')
-    selected_skill_id = request.GET.get('skill')
-    courses = Course.objects.all().prefetch_related('skills')
-    base_skills = Skill.objects.filter(is_base=True)
-    
-    # Проверяем, не является ли значение course строкой "None"
-    if course_id == 'None':
-        course_id = None
-        
     # Для фильтрации графа по курсу
-    if course_id and course_id != '':
+    filter_by_course = bool(course_id and course_id != '')
+    if filter_by_course:
         try:
             course = Course.objects.get(id=course_id)
-            course_skills = course.skills.all().prefetch_related('prerequisites')
+            course_skills = skills_graph_queryset(course.skills.all(), with_dependents=bool(selected_skill_id))
         except Course.DoesNotExist:
             course_skills = Skill.objects.none()
+        # Навыки курса загружаются здесь один раз: множество id заменяет
+        # запросы на принадлежность навыка курсу, а граф берет кэш queryset
+        course_skill_ids = {skill.id for skill in course_skills}
     else:
-        course_skills = Skill.objects.all().prefetch_related('prerequisites')
+        course_skills = all_skills
+        course_skill_ids = set()
     
     # Если выбран конкретный навык, убедимся, что данные для графа содержат его и его прямые зависимости
     if selected_skill_id and selected_skill_id.isdigit():
@@ -40,47 +114,75 @@ def skills_list(request):
             # Проверяем существование навыка перед созданием графа
             selected_skill = Skill.objects.get(id=selected_skill_id)
             
-            # Используем все навыки, так как при выборе конкретного навыка 
-            # нам всегда нужно показать его зависимости независимо от курса
-            all_skills = Skill.objects.all().prefetch_related('prerequisites')
-            
             # Если выбран курс, проверяем принадлежит ли навык курсу
             if course_id and course_id != '':
                 # Если навык принадлежит курсу, используем данные курса с выбранным навыком
-                if course_skills.filter(id=selected_skill.id).exists():
+                if selected_skill.id in course_skill_ids:
                     # Передаем выбранный навык для отображения только его и прямых зависимостей
-                    cytoscape_data = generate_cytoscape_data(course_skills, selected_skill_id)
+                    cytoscape_data = generate_cytoscape_data(course_skills, selected_skill_id, filter_by_course=True, raise_errors=True)
                 # Если навык не принадлежит курсу, но выбран курс - показываем только курс
                 else:
                     # Показываем обычный граф курса без выбранного навыка
-                    cytoscape_data = generate_cytoscape_data(course_skills)
+                    cytoscape_data = generate_cytoscape_data(course_skills, filter_by_course=True, raise_errors=True)
             # Если курс не выбран, отображаем выбранный навык с его прямыми зависимостями
             else:
+                # Используем все навыки, так как при выборе конкретного навыка
+                # нам всегда нужно показать его зависимости независимо от курса.
+                # Зависимые навыки догружаются в уже загруженные объекты списка
+                skills = list(all_skills)
+                prefetch_related_objects(skills, dependent_skills_prefetch())
                 # Генерируем данные для графа с выбранным навыком
-                cytoscape_data = generate_cytoscape_data(all_skills, selected_skill_id)
+                cytoscape_data = generate_cytoscape_data(skills, selected_skill_id, raise_errors=True)
                 
         except Skill.DoesNotExist:
             # Если навык не найден, показываем обычный граф
-            print(f"Ошибка: Навык с ID {selected_skill_id} не найден")
-            cytoscape_data = generate_cytoscape_data(course_skills)
+            logger.warning("Навык с ID %s не найден", selected_skill_id)
+            cytoscape_data = generate_cytoscape_data(course_skills, filter_by_course=filter_by_course, raise_errors=True)
     else:
         # Если навык не выбран, отображаем обычный граф с фильтрацией по курсу
-        cytoscape_data = generate_cytoscape_data(course_skills)
+        cytoscape_data = generate_cytoscape_data(course_skills, filter_by_course=filter_by_course, raise_errors=True)
 
-    # Для отображения зависимостей в списке
-    all_skills = Skill.objects.prefetch_related('prerequisites').all()
-    
     # Проверка, относится ли выбранный навык к курсу
     skill_in_course = False
-    if selected_skill_id and course_id:
+    if selected_skill_id and course_id and selected_skill_id.isdigit():
+        # Проверяем, принадлежит ли навык выбранному курсу
+        skill_in_course = int(selected_skill_id) in course_skill_ids
+    
+    return cytoscape_data, skill_in_course
+
+
+@login_required
+def skills_list(request):
+    """
+    Отображает список всех навыков с группировкой по курсам, поддерживает фильтрацию графа по курсу
+    """
+    course_id = request.GET.get('course')
+    selected_skill_id = request.GET.get('skill')
+    # Курсы нужны только для выпадающего списка фильтра
+    courses = Course.objects.only('id', 'name')
+    base_skills = Skill.objects.filter(is_base=True)
+    
+    # Проверяем, не является ли значение course строкой "None"
+    if course_id == 'None':
+        course_id = None
+        
+    # Для отображения зависимостей в списке; тот же queryset строит граф без курса,
+    # поэтому навыки загружаются не более одного раза за запрос
+    all_skills = skills_graph_queryset()
+    
+    # Граф одинаков для одинаковых параметров, пока навыки не изменились;
+    # в кэш попадает только успешно построенный граф
+    graph_key = skills_graph_cache_key(course_id, selected_skill_id)
+    cached_graph = cache.get(graph_key)
+    if cached_graph is not None:
+        cytoscape_data, skill_in_course = cached_graph
+    else:
         try:
-            # Проверяем, принадлежит ли навык выбранному курсу
-            skill_in_course = Skill.objects.filter(
-                id=selected_skill_id,
-                courses__id=course_id
-            ).exists()
-        except Exception as e:
-            print(f"Ошибка при проверке принадлежности навыка курсу: {e}")
+            cytoscape_data, skill_in_course = build_skills_list_graph(course_id, selected_skill_id, all_skills)
+            cache.set(graph_key, (cytoscape_data, skill_in_course), SKILLS_GRAPH_CACHE_TIMEOUT)
+        except DatabaseError:
+            logger.exception("Ошибка при загрузке навыков для графа Cytoscape")
+            cytoscape_data, skill_in_course = error_graph_json(), False
     
     context = {
         'courses': courses,
@@ -93,177 +195,120 @@ def skills_list(request):
     }
     return render(request, 'skills/skills_list.html', context)
 
-def generate_cytoscape_data(skills_queryset=None, selected_skill_id=None):
+def error_graph_json():
+    """Пустой граф с описанием ошибки - показывается, если навыки не удалось загрузить"""
+    return dumps_json({
+        'nodes': [],
+        'edges': [],
+        'meta': {
+            'error': 'Ошибка при формировании графа',
+            'timestamp': str(datetime.datetime.now())
+        }
+    })
+
+
+def generate_cytoscape_data(skills_queryset=None, selected_skill_id=None, filter_by_course=False, raise_errors=False):
     """
     Генерирует данные для интерактивного графа Cytoscape.js
     skills_queryset: если передан, строит граф только по этим навыкам
     selected_skill_id: если передан, включает навык и его зависимости в граф
+    filter_by_course: навыки отфильтрованы по курсу, связи выбранного навыка ограничиваются ими
+    raise_errors: пробрасывать ошибки БД вместо графа с ошибкой (чтобы вызывающий код не кэшировал его)
     """
+    # С базой работает только загрузка навыков и их связей - ошибки БД
+    # перехватываются здесь, сборка графа ниже идет уже по данным в памяти
     try:
         if skills_queryset is None:
-            skills = Skill.objects.all().only('id', 'name', 'is_base').prefetch_related('prerequisites')
-        else:
-            skills = skills_queryset
+            skills_queryset = skills_graph_queryset(with_dependents=bool(selected_skill_id))
+        # Загружаем навыки один раз, дальше работаем со списком в памяти
+        skills = list(skills_queryset)
+        # Догружаем предпосылки навыкам, переданным без предзагрузки (например, множеством)
+        prefetch_related_objects(skills, 'prerequisites')
     
         # Проверяем, передан ли выбранный навык
         selected_skill = None
         if selected_skill_id:
-            try:
-                selected_skill = Skill.objects.get(id=selected_skill_id)
-            except Skill.DoesNotExist:
-                print(f"Ошибка: Навык с ID {selected_skill_id} не найден")
-                selected_skill_id = None
+            # Берем навык из уже загруженного набора, чтобы не запрашивать его связи заново
+            selected_skill = next((skill for skill in skills if str(skill.id) == str(selected_skill_id)), None)
+            if selected_skill is None:
+                try:
+                    selected_skill = skills_graph_queryset(with_dependents=True).get(id=selected_skill_id)
+                except Skill.DoesNotExist:
+                    logger.warning("Навык с ID %s не найден", selected_skill_id)
+                    selected_skill_id = None
+            if selected_skill is not None:
+                prefetch_related_objects([selected_skill], 'dependent_skills')
+    except DatabaseError:
+        if raise_errors:
+            raise
+        logger.exception("Ошибка при загрузке навыков для графа Cytoscape")
         
-        # Определяем по переданному набору данных, была ли применена фильтрация по курсу
-        if skills_queryset is not None and hasattr(skills_queryset, 'model') and skills_queryset.model == Skill:
-            # Проверяем, это полный набор навыков или отфильтрованный по курсу
-            total_skills_count = Skill.objects.count()
-            current_skills_count = skills_queryset.count()
-            filter_by_course = current_skills_count < total_skills_count
-        else:
-            filter_by_course = False
-        
-        # Если выбран конкретный навык, строим граф с ним и его непосредственными связями
-        nodes = []
-        edges = []
-        skill_ids_in_graph = set()
+        # Возвращаем пустой граф в случае ошибки
+        return error_graph_json()
+    
+    # Если выбран конкретный навык, строим граф с ним и его непосредственными связями
+    nodes = []
+    edges = []
+    skill_ids_in_graph = set()
+    
+    if selected_skill and selected_skill_id:
+        # Добавляем выбранный навык
+        nodes.append(cytoscape_node(selected_skill))
+        skill_ids_in_graph.add(selected_skill.id)
         
-        if selected_skill and selected_skill_id:
-            # Добавляем выбранный навык
-            nodes.append({
-                'data': {
-                    'id': f'skill_{selected_skill.id}',
-                    'name': selected_skill.name,
-                    'is_base': selected_skill.is_base,
-                    'skill_id': selected_skill.id
-                },
-                'classes': "base-skill" if selected_skill.is_base else "regular-skill"
-            })
-            skill_ids_in_graph.add(selected_skill.id)
-            
-            # Определяем связи в зависимости от применения фильтра по курсу
-            if filter_by_course:
-                selected_course_skills = set(s.id for s in skills)
-                # Получаем только непосредственные предпосылки, фильтруя по курсу
-                prereqs = [prereq for prereq in selected_skill.prerequisites.all() 
-                          if prereq.id in selected_course_skills]
-                # Получаем только непосредственно зависимые навыки, фильтруя по курсу
-                dependents = [dep for dep in selected_skill.dependent_skills.all() 
-                            if dep.id in selected_course_skills]
-            else:
-                # Если нет фильтра по курсу, добавляем все непосредственные связи
-                prereqs = list(selected_skill.prerequisites.all())
-                dependents = list(selected_skill.dependent_skills.all())
-            
-            # Добавляем предпосылки
-            for prereq in prereqs:
-                if prereq.id not in skill_ids_in_graph:
-                    nodes.append({
-                        'data': {
-                            'id': f'skill_{prereq.id}',
-                            'name': prereq.name,
-                            'is_base': prereq.is_base,
-                            'skill_id': prereq.id
-                        },
-                        'classes': "base-skill" if prereq.is_base else "regular-skill"
-                    })
-                    skill_ids_in_graph.add(prereq.id)
-            
-            # Добавляем зависимые навыки
-            for dependent in dependents:
-                if dependent.id not in skill_ids_in_graph:
-                    nodes.append({
-                        'data': {
-                            'id': f'skill_{dependent.id}',
-                            'name': dependent.name,
-                            'is_base': dependent.is_base,
-                            'skill_id': dependent.id
-                        },
-                        'classes': "base-skill" if dependent.is_base else "regular-skill"
-                    })
-                    skill_ids_in_graph.add(dependent.id)
-            
-            # Добавляем ребра только для прямых связей выбранного навыка
-            for prereq in prereqs:
-                if prereq.id in skill_ids_in_graph:
-                    edges.append({
-                        'data': {
-                            'id': f'edge_{prereq.id}_{selected_skill.id}',
-                            'source': f'skill_{prereq.id}',
-                            'target': f'skill_{selected_skill.id}'
-                        }
-                    })
-            
-            for dependent in dependents:
-                if dependent.id in skill_ids_in_graph:
-                    edges.append({
-                        'data': {
-                            'id': f'edge_{selected_skill.id}_{dependent.id}',
-                            'source': f'skill_{selected_skill.id}',
-                            'target': f'skill_{dependent.id}'
-                        }
-                    })
-            
+        # Определяем связи в зависимости от применения фильтра по курсу
+        if filter_by_course:
+            selected_course_skills = set(s.id for s in skills)
+            # Получаем только непосредственные предпосылки, фильтруя по курсу
+            prereqs = [prereq for prereq in selected_skill.prerequisites.all() 
+                      if prereq.id in selected_course_skills]
+            # Получаем только непосредственно зависимые навыки, фильтруя по курсу
+            dependents = [dep for dep in selected_skill.dependent_skills.all() 
+                        if dep.id in selected_course_skills]
         else:
-            # Обычный режим: добавляем все навыки и их связи
-            for skill in skills:
-                node_class = "base-skill" if skill.is_base else "regular-skill"
-                nodes.append({
-                    'data': {
-                        'id': f'skill_{skill.id}',
-                        'name': skill.name,
-                        'is_base': skill.is_base,
-                        'skill_id': skill.id
-                    },
-                    'classes': node_class
-                })
-                skill_ids_in_graph.add(skill.id)
-            
-            # Добавляем все связи между навыками
-            added_edges = set()
-            for skill in skills:
-                for prereq in skill.prerequisites.all():
-                    # Проверяем, что оба навыка есть в графе
-                    if prereq.id in skill_ids_in_graph and skill.id in skill_ids_in_graph:
-                        edge_id = f'edge_{prereq.id}_{skill.id}'
-                        if edge_id not in added_edges:
-                            edges.append({
-                                'data': {
-                                    'id': edge_id,
-                                    'source': f'skill_{prereq.id}',
-                                    'target': f'skill_{skill.id}'
-                                }
-                            })
-                            added_edges.add(edge_id)
+            # Если нет фильтра по курсу, добавляем все непосредственные связи
+            prereqs = list(selected_skill.prerequisites.all())
+            dependents = list(selected_skill.dependent_skills.all())
         
-        # Формируем результат
-        cytoscape_data = {
-            'nodes': nodes,
-            'edges': edges
-        }
+        # Добавляем предпосылки
+        for prereq in prereqs:
+            if prereq.id not in skill_ids_in_graph:
+                nodes.append(cytoscape_node(prereq))
+                skill_ids_in_graph.add(prereq.id)
         
-        # Проверяем результат
-        if not nodes:
-            print("Предупреждение: Пустой список узлов в графе")
+        # Добавляем зависимые навыки
+        for dependent in dependents:
+            if dependent.id not in skill_ids_in_graph:
+                nodes.append(cytoscape_node(dependent))
+                skill_ids_in_graph.add(dependent.id)
         
-        # Сериализуем данные
-        return json.dumps(cytoscape_data)
+        # Добавляем ребра только для прямых связей выбранного навыка
+        for prereq in prereqs:
+            if prereq.id in skill_ids_in_graph:
+                edges.append(cytoscape_edge(prereq.id, selected_skill.id))
         
-    except Exception as e:
-        print(f"Ошибка при создании данных для Cytoscape: {e}")
-        import traceback
-        traceback.print_exc()
+        for dependent in dependents:
+            if dependent.id in skill_ids_in_graph:
+                edges.append(cytoscape_edge(selected_skill.id, dependent.id))
         
-        # Возвращаем пустой граф в случае ошибки
-        empty_graph = {
-            'nodes': [],
-            'edges': [],
-            'meta': {
-                'error': 'Ошибка при формировании графа',
-                'timestamp': str(datetime.datetime.now())
-            }
-        }
-        return json.dumps(empty_graph)
+    else:
+        # Обычный режим: добавляем все навыки и их связи
+        nodes = [cytoscape_node(skill) for skill in skills]
+        skill_ids_in_graph = {skill.id for skill in skills}
+        
+        # Добавляем все связи между навыками. Зависимый навык всегда есть в графе,
+        # проверяем только предпосылку; связи уникальны на уровне промежуточной таблицы
+        for skill in skills:
+            for prereq in skill.prerequisites.all():
+                if prereq.id in skill_ids_in_graph:
+                    edges.append(cytoscape_edge(prereq.id, skill.id))
+    
+    # Проверяем результат
+    if not nodes:
+        logger.warning("Пустой список узлов в графе")
+    
+    # Формируем результат из готовых JSON-фрагментов
+    return cytoscape_graph(nodes, edges)
     
     
 @login_required
@@ -275,11 +320,11 @@ def skills_edit(request):
     course_id = request.GET.get('course')
     skill_id = request.GET.get('skill')
     
-    # Загрузка всех курсов
-    courses = Course.objects.all().prefetch_related('skills')
+    # Загрузка всех курсов: в шаблоне и courses_json нужны только id и название
+    courses = Course.objects.only('id', 'name')
     
-    # Фильтрация навыков
-    filtered_skills = Skill.objects.all().prefetch_related('prerequisites')
+    # Фильтрация навыков; курсы и предпосылки предзагружаются для списка и skills_json
+    filtered_skills = Skill.objects.all().prefetch_related('prerequisites', 'courses')
     
     if search_query:
         filtered_skills = filtered_skills.filter(name__icontains=search_query)
@@ -308,13 +353,13 @@ def skills_edit(request):
             
             cytoscape_data = generate_cytoscape_data(graph_skills)
         except Skill.DoesNotExist:
-            cytoscape_data = json.dumps({'nodes': [], 'edges': []})
+            cytoscape_data = dumps_json({'nodes': [], 'edges': []})
     else:
-        cytoscape_data = json.dumps({'nodes': [], 'edges': []})
+        cytoscape_data = dumps_json({'nodes': [], 'edges': []})
     
     # сериализация курсов
     courses_json = json.dumps(
-        list(courses.values('id', 'name')),
+        [{'id': course.id, 'name': course.name} for course in courses],
         cls=DjangoJSONEncoder
     )
     # сериализация навыков
@@ -322,8 +367,8 @@ def skills_edit(request):
         {
             'id': s.id,
             'name': s.name,
-            'courses': list(s.courses.values_list('id', flat=True)),
-            'prerequisites': list(s.prerequisites.values_list('id', flat=True)),
+            'courses': [course.id for course in s.courses.all()],
+            'prerequisites': [prereq.id for prereq in s.prerequisites.all()],
         } for s in filtered_skills
     ], cls=DjangoJSONEncoder)
 
@@ -358,10 +403,12 @@ def edit_skill(request):
     
     # Обновляем существующий или создаем новый навык
     if skill_id:
-        skill = get_object_or_404(Skill, id=skill_id)
-        skill.name = name
-        skill.is_base = is_base
-        skill.save()
+        # Один UPDATE без предварительного SELECT; update() не отправляет
+        # post_save, поэтому кэш графов навыков сбрасываем явно
+        if not Skill.objects.filter(id=skill_id).update(name=name, is_base=is_base):
+            raise Http404('Навык не найден')
+        bump_skills_version()
+        skill = Skill(id=skill_id, name=name, is_base=is_base)
         messages.success(request, f'Навык "{name}" успешно обновлен')
         
         # ИЗМЕНЕНИЕ: При редактировании навыка НЕ обновляем связи с курсами,
@@ -396,7 +443,9 @@ def delete_skill(request):
         messages.error(request, 'Не указан навык для удаления')
         return redirect('skills_edit')
     
-    skill = get_object_or_404(Skill, id=skill_id)
+    # Удаление все равно загружает объект для сигналов post_delete,
+    # поэтому берем только нужные поля одним запросом
+    skill = get_object_or_404(Skill.objects.only('id', 'name'), id=skill_id)
     skill_name = skill.name
     skill.delete()
     
@@ -439,17 +488,16 @@ def api_skill_courses(request, skill_id):
     API для получения курсов, к которым относится навык
     """
     try:
-        try:
-            skill = Skill.objects.get(id=skill_id)
-            courses = skill.courses.all().values('id', 'name')
-            
-            return JsonResponse({
-                'skill_id': skill_id,
-                'skill_name': skill.name,
-                'courses': list(courses.values_list('id', flat=True))
-            })
-        except Skill.DoesNotExist:
+        # Название навыка и id его курсов - одним запросом (LEFT JOIN по курсам)
+        rows = list(Skill.objects.filter(id=skill_id).values_list('name', 'courses__id'))
+        if not rows:
             return JsonResponse({'error': f'Навык с ID {skill_id} не найден'}, status=404)
+        
+        return JsonResponse({
+            'skill_id': skill_id,
+            'skill_name': rows[0][0],
+            'courses': [course_id for _, course_id in rows if course_id is not None]
+        })
     except Exception as e:
         return JsonResponse({'error': f'Ошибка при получении курсов: {str(e)}'}, status=500)
 
@@ -459,30 +507,28 @@ def api_skill_details(request, skill_id):
     API для получения подробной информации о навыке
     """
     try:
-        # Сначала проверяем существование навыка
+        # Навык, количество связей и курсы - одним запросом и одной предзагрузкой.
+        # distinct обязателен: два JOIN по M2M перемножают строки
         try:
-            skill = Skill.objects.get(id=skill_id)
+            skill = Skill.objects.annotate(
+                prerequisites_count=Count('prerequisites', distinct=True),
+                dependents_count=Count('dependent_skills', distinct=True)
+            ).prefetch_related('courses').get(id=skill_id)
         except Skill.DoesNotExist:
             return JsonResponse({'error': f'Навык с ID {skill_id} не найден'}, status=404)
         
-        # Получаем количество зависимостей
-        prerequisites_count = skill.prerequisites.count()
-        
-        # Получаем количество зависимых навыков
-        # Используем более надежный способ без прямого доступа к related_name
-        dependents_count = Skill.objects.filter(prerequisites=skill).count()
-        
-        # Получаем курсы
-        courses = list(skill.courses.values_list('id', flat=True))
-        course_names = list(skill.courses.values_list('name', flat=True))
+        # Получаем курсы за один проход по предзагруженным данным
+        skill_courses = skill.courses.all()
+        courses = [course.id for course in skill_courses]
+        course_names = [course.name for course in skill_courses]
         
         # Формируем и возвращаем ответ
         return JsonResponse({
             'skill_id': skill.id,
             'name': skill.name,
             'is_base': skill.is_base,
-            'prerequisites_count': prerequisites_count,
-            'dependents_count': dependents_count,
+            'prerequisites_count': skill.prerequisites_count,
+            'dependents_count': skill.dependents_count,
             'courses': courses,
             'course_names': course_names
         })
@@ -495,62 +541,85 @@ def api_skill_details(request, skill_id):
         return JsonResponse({'error': str(e)}, status=500)
 
 
+def _prerequisite_ids(request):
+    """
+    id предпосылок из запроса: список prereq_ids (пакетное изменение) или одиночный prereq_id.
+    Возвращает уникальные id в виде int; ValueError, если id не передан или не является числом
+    """
+    raw_ids = request.POST.getlist('prereq_ids') or [request.POST.get('prereq_id')]
+    try:
+        return list(dict.fromkeys(int(raw_id) for raw_id in raw_ids))
+    except (TypeError, ValueError):
+        raise ValueError(f"Неверные id предпосылок: {raw_ids}")
+
+
+def _find_prerequisite_cycle(skill_id, prereq_ids):
+    """
+    Проверка на циклические зависимости: обход графа предпосылок от prereq_ids
+    по уровням, один запрос к таблице связей на уровень.
+    Возвращает id предпосылки, от которой есть путь к skill_id, или None
+    """
+    through = Skill.prerequisites.through
+    # Для каждого посещенного навыка запоминаем, от какой предпосылки к нему пришли
+    origins = {prereq_id: prereq_id for prereq_id in prereq_ids}
+    frontier = list(prereq_ids)
+    while frontier:
+        next_frontier = []
+        edges = through.objects.filter(from_skill_id__in=frontier).values_list('from_skill_id', 'to_skill_id')
+        for from_id, to_id in edges:
+            if to_id == skill_id:
+                return origins[from_id]
+            if to_id not in origins:
+                origins[to_id] = origins[from_id]
+                next_frontier.append(to_id)
+        frontier = next_frontier
+    return None
+
+
 @require_POST
 def api_add_prerequisite(request):
     """
     API для добавления предварительного требования к навыку
+    (или сразу нескольких через prereq_ids)
     """
-    skill_id = request.POST.get('skill_id')
-    prereq_id = request.POST.get('prereq_id')
-    
-    if not skill_id or not prereq_id:
-        return JsonResponse({'error': 'Не переданы параметры'}, status=400)
+    try:
+        skill_id = int(request.POST['skill_id'])
+        prereq_ids = _prerequisite_ids(request)
+    except (KeyError, ValueError):
+        return JsonResponse({'error': 'Не переданы или неверно указаны параметры'}, status=400)
         
-    if skill_id == prereq_id:
+    if skill_id in prereq_ids:
         return JsonResponse({'error': 'Навык не может быть предпосылкой для самого себя'}, status=400)
     
     try:
-        skill = Skill.objects.get(id=skill_id)
-        prereq = Skill.objects.get(id=prereq_id)
+        skill = Skill.objects.only('id', 'name').get(id=skill_id)
+        prereqs = list(Skill.objects.only('id', 'name').filter(id__in=prereq_ids))
+        if len(prereqs) != len(prereq_ids):
+            raise Skill.DoesNotExist
         
         # Проверяем, не является ли уже предпосылкой
-        if prereq in skill.prerequisites.all():
+        if skill.prerequisites.filter(id__in=prereq_ids).exists():
             return JsonResponse({'error': 'Этот навык уже является предпосылкой'}, status=400)
         
-        # Проверяем на циклические зависимости
-        def would_create_cycle(skill_obj, new_prereq):
-            """
-            Проверяет, создаст ли добавление new_prereq к skill циклическую зависимость
-            """
-            visited = set()
-            
-            def has_path_to_skill(current_skill, target_skill):
-                if current_skill.id == target_skill.id:
-                    return True
-                if current_skill.id in visited:
-                    return False
-                visited.add(current_skill.id)
-                
-                # Проверяем все предпосылки текущего навыка
-                for prereq in current_skill.prerequisites.all():
-                    if has_path_to_skill(prereq, target_skill):
-                        return True
-                return False
-            
-            # Проверяем, есть ли путь от new_prereq к skill
-            return has_path_to_skill(new_prereq, skill_obj)
-        
-        if would_create_cycle(skill, prereq):
+        cycle_prereq_id = _find_prerequisite_cycle(skill.id, prereq_ids)
+        if cycle_prereq_id is not None:
+            prereq = next(prereq for prereq in prereqs if prereq.id == cycle_prereq_id)
             return JsonResponse({
                 'error': f'Добавление навыка "{prereq.name}" как предпосылки для "{skill.name}" создаст циклическую зависимость'
             }, status=400)
         
-        # Добавляем предпосылку
-        skill.prerequisites.add(prereq)
+        # Добавляем предпосылки одним INSERT (m2m_changed сбрасывает кэш графа)
+        skill.prerequisites.add(*prereqs)
+        
+        if len(prereqs) == 1:
+            message = f'Навык "{prereqs[0].name}" успешно добавлен как предпосылка для "{skill.name}"'
+        else:
+            names = ', '.join(f'"{prereq.name}"' for prereq in prereqs)
+            message = f'Навыки {names} успешно добавлены как предпосылки для "{skill.name}"'
         
         return JsonResponse({
             'success': True, 
-            'message': f'Навык "{prereq.name}" успешно добавлен как предпосылка для "{skill.name}"'
+            'message': message
         })
         
     except Skill.DoesNotExist:
@@ -561,14 +630,17 @@ def api_add_prerequisite(request):
 
 @require_POST
 def api_remove_prerequisite(request):
-    skill_id = request.POST.get('skill_id')
-    prereq_id = request.POST.get('prereq_id')
-    if not skill_id or not prereq_id:
-        return JsonResponse({'error': 'Не переданы параметры'}, status=400)
     try:
-        skill = Skill.objects.get(id=skill_id)
-        prereq = Skill.objects.get(id=prereq_id)
-        skill.prerequisites.remove(prereq)
+        skill_id = int(request.POST['skill_id'])
+        prereq_ids = _prerequisite_ids(request)
+    except (KeyError, ValueError):
+        return JsonResponse({'error': 'Не переданы или неверно указаны параметры'}, status=400)
+    try:
+        skill = Skill.objects.only('id').get(id=skill_id)
+        # Существование всех предпосылок проверяем одним запросом
+        if Skill.objects.filter(id__in=prereq_ids).count() != len(prereq_ids):
+            raise Skill.DoesNotExist
+        skill.prerequisites.remove(*prereq_ids)
         return JsonResponse({'success': True})
     except Skill.DoesNotExist:
         return JsonResponse({'error': 'Навык не найден'}, status=404)
@@ -1,9 +1,19 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.contrib.admin.views.main import ChangeList
 from django.contrib.auth.models import User
 from .models import StudentProfile, StudentCourseEnrollment
 
 
+class ProjectedChangeList(ChangeList):
+    """
+    Список объектов в админке, загружающий только колонки из list_only_fields
+    """
+    def get_queryset(self, request, exclude_parameters=None):
+        queryset = super().get_queryset(request, exclude_parameters)
+        return queryset.only(*self.model_admin.list_only_fields)
+
+
 class StudentProfileInline(admin.StackedInline):
     """
     Inline для отображения профиля студента в админке пользователя
@@ -24,7 +34,7 @@ class UserAdmin(BaseUserAdmin):
         """
         Показываем inline профиля только для студентов
         """
-        if obj and 'student' in obj.username.lower():
+        if obj and obj.groups.filter(name='student').exists():
             return super().get_inline_instances(request, obj)
         return []
 
@@ -36,7 +46,12 @@ class StudentProfileAdmin(admin.ModelAdmin):
     """
     list_display = ('full_name', 'user_username', 'email', 'organization', 'is_active', 'created_at')
     list_filter = ('is_active', 'organization', 'created_at')
-    search_fields = ('full_name', 'user__username', 'email', 'organization')
+    # Организация доступна в фильтрах; логин ищется по префиксу, чтобы работал индекс
+    search_fields = ('full_name', '^user__username', 'email')
+    list_select_related = ('user',)
+    list_only_fields = ('full_name', 'email', 'organization', 'is_active', 'created_at', 'user__username')
+    raw_id_fields = ('user',)
+    show_full_result_count = False
     readonly_fields = ('created_at', 'updated_at')
     fieldsets = (
         ('Основная информация', {
@@ -54,6 +69,13 @@ class StudentProfileAdmin(admin.ModelAdmin):
         }),
     )
     
+    def get_queryset(self, request):
+        """Подгружаем пользователя одним запросом вместе с профилями"""
+        return super().get_queryset(request).select_related('user')
+    
+    def get_changelist(self, request, **kwargs):
+        return ProjectedChangeList
+    
     def user_username(self, obj):
         """Отображает имя пользователя"""
         return obj.user.username
@@ -68,7 +90,14 @@ class StudentCourseEnrollmentAdmin(admin.ModelAdmin):
     """
     list_display = ('student_name', 'course_name', 'status', 'progress_percentage', 'enrolled_at', 'completed_at')
     list_filter = ('status', 'course', 'enrolled_at', 'completed_at')
-    search_fields = ('student__full_name', 'student__user__username', 'course__name')
+    search_fields = ('student__full_name', '^student__user__username', 'course__name')
+    list_select_related = ('student', 'course')
+    list_only_fields = (
+        'status', 'progress_percentage', 'enrolled_at', 'completed_at',
+        'student__full_name', 'course__name'
+    )
+    raw_id_fields = ('student', 'course')
+    show_full_result_count = False
     readonly_fields = ('enrolled_at',)
     fieldsets = (
         ('Основная информация', {
@@ -86,6 +115,13 @@ class StudentCourseEnrollmentAdmin(admin.ModelAdmin):
         }),
     )
     
+    def get_queryset(self, request):
+        """Подгружаем студента и курс одним запросом"""
+        return super().get_queryset(request).select_related('student', 'course')
+    
+    def get_changelist(self, request, **kwargs):
+        return ProjectedChangeList
+    
     def student_name(self, obj):
         """Отображает имя студента"""
         return obj.student.full_name
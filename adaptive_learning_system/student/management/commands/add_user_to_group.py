@@ -19,8 +19,9 @@ class Command(BaseCommand):
         try:
             # Получаем пользователя
             user = User.objects.get(username=username)
+            full_name = user.get_full_name() or 'Не указано'
             self.stdout.write(f"✅ Найден пользователь: {user.username} (ID: {user.id})")
-            self.stdout.write(f"   Имя: {user.get_full_name() or 'Не указано'}")
+            self.stdout.write(f"   Имя: {full_name}")
             self.stdout.write(f"   Email: {user.email}")
             
             # Получаем или создаем группу
@@ -31,11 +32,11 @@ class Command(BaseCommand):
                 self.stdout.write(f"✅ Найдена группа: {group_name}")
             
             # Проверяем, не состоит ли уже в группе
-            if user.groups.filter(name=group_name).exists():
+            if user.groups.filter(pk=group.pk).exists():
                 self.stdout.write(self.style.WARNING(f"⚠️  Пользователь {username} уже состоит в группе {group_name}"))
                 return
             
-            # Добавляем в группу
+            # Добавляем через менеджер, чтобы сработал m2m_changed (создание профиля студента)
             user.groups.add(group)
             
             self.stdout.write(self.style.SUCCESS(f"🎉 Пользователь {username} успешно добавлен в группу {group_name}"))
@@ -60,8 +61,8 @@ class Command(BaseCommand):
             self.stdout.write(self.style.ERROR(f"❌ Пользователь {username} не найден"))
             
             # Показываем доступных пользователей
-            users = User.objects.all()
-            if users.exists():
+            users = list(User.objects.all().prefetch_related('groups'))
+            if users:
                 self.stdout.write(f"\n📋 Доступные пользователи:")
                 for user in users:
                     groups = [g.name for g in user.groups.all()]
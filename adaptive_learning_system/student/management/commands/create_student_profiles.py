@@ -1,4 +1,7 @@
+import random
+
 from django.core.management.base import BaseCommand
+from django.db import transaction
 from django.contrib.auth.models import User
 from student.models import StudentProfile, StudentCourseEnrollment
 from skills.models import Course
@@ -7,31 +10,43 @@ from skills.models import Course
 class Command(BaseCommand):
     help = "Создает профили для существующих студентов и записывает их на курсы"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed',
+            type=int,
+            help='Seed для воспроизводимости результатов',
+            default=None
+        )
+
     def handle(self, *args, **options):
-        # Создаем профили для существующих студентов
-        students = User.objects.filter(username__icontains='student')
-        created_profiles = 0
+        # Создаем профили для существующих студентов (роль определяется группой, как в сигнале)
+        students = list(User.objects.filter(groups__name='student'))
+        existing_user_ids = set(
+            StudentProfile.objects.filter(user__in=students).values_list('user_id', flat=True)
+        )
         
+        profiles_to_create = []
         for user in students:
-            profile, created = StudentProfile.objects.get_or_create(
+            if user.id in existing_user_ids:
+                self.stdout.write(f"Профиль для {user.username} уже существует")
+                continue
+            
+            profile = StudentProfile(
                 user=user,
-                defaults={
-                    'full_name': f"{user.first_name} {user.last_name}".strip() or user.username.title(),
-                    'email': user.email or f"{user.username}@example.com",
-                    'organization': 'Тестовый университет',
-                }
+                full_name=f"{user.first_name} {user.last_name}".strip() or user.username.title(),
+                email=user.email or f"{user.username}@example.com",
+                organization='Тестовый университет',
             )
-            
-            if created:
-                created_profiles += 1
-                self.stdout.write(
-                    self.style.SUCCESS(f"Создан профиль для {user.username}: {profile.full_name}")
-                )
-            else:
-                self.stdout.write(f"Профиль для {user.username} уже существует")
+            profiles_to_create.append(profile)
+            self.stdout.write(
+                self.style.SUCCESS(f"Создан профиль для {user.username}: {profile.full_name}")
+            )
+        
+        with transaction.atomic():
+            StudentProfile.objects.bulk_create(profiles_to_create, batch_size=1000, ignore_conflicts=True)
         
         self.stdout.write(
-            self.style.SUCCESS(f"Создано {created_profiles} новых профилей студентов")
+            self.style.SUCCESS(f"Создано {len(profiles_to_create)} новых профилей студентов")
         )
         
         # Записываем студентов на случайные курсы для демонстрации
@@ -43,28 +58,46 @@ class Command(BaseCommand):
             )
             return
         
-        enrolled_count = 0
-        for profile in StudentProfile.objects.all():
-            # Записываем каждого студента на 1-2 курса
-            import random
-            selected_courses = random.sample(courses, min(2, len(courses)))
-            
-            for course in selected_courses:
-                enrollment, created = StudentCourseEnrollment.objects.get_or_create(
-                    student=profile,
-                    course=course,
-                    defaults={
-                        'status': 'in_progress',
-                        'progress_percentage': random.randint(10, 80),
-                    }
-                )
-                
-                if created:
-                    enrolled_count += 1
-                    self.stdout.write(
-                        f"Записан {profile.full_name} на курс {course.name}"
-                    )
+        rng = random.Random(options.get('seed'))
+        
+        # Записываем каждого студента на 1-2 курса
+        profile_names = dict(StudentProfile.objects.values_list('id', 'full_name'))
+        sample_size = min(2, len(courses))
+        course_assignments = {
+            profile_id: rng.sample(courses, sample_size)
+            for profile_id in profile_names
+        }
+        
+        # Уже существующие записи загружаем одним запросом и пропускаем
+        existing_enrollments = set(
+            StudentCourseEnrollment.objects
+            .filter(course__in=courses)
+            .values_list('student_id', 'course_id')
+        )
+        
+        enrollments_to_create = [
+            StudentCourseEnrollment(
+                student_id=profile_id,
+                course=course,
+                status='in_progress',
+                progress_percentage=rng.randint(10, 80),
+            )
+            for profile_id, selected_courses in course_assignments.items()
+            for course in selected_courses
+            if (profile_id, course.id) not in existing_enrollments
+        ]
+        
+        # ignore_conflicts страхует от записей, появившихся после проверки (unique_together)
+        with transaction.atomic():
+            StudentCourseEnrollment.objects.bulk_create(
+                enrollments_to_create, batch_size=1000, ignore_conflicts=True
+            )
+        
+        for enrollment in enrollments_to_create:
+            self.stdout.write(
+                f"Записан {profile_names[enrollment.student_id]} на курс {enrollment.course.name}"
+            )
         
         self.stdout.write(
-            self.style.SUCCESS(f"Создано {enrolled_count} записей на курсы")
+            self.style.SUCCESS(f"Создано {len(enrollments_to_create)} записей на курсы")
         )
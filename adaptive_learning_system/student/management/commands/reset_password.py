@@ -19,9 +19,10 @@ class Command(BaseCommand):
         try:
             # Получаем пользователя
             user = User.objects.get(username=username)
+            full_name = user.get_full_name() or 'Не указано'
             
             self.stdout.write(f"✅ Найден пользователь: {user.username} (ID: {user.id})")
-            self.stdout.write(f"   Имя: {user.get_full_name() or 'Не указано'}")
+            self.stdout.write(f"   Имя: {full_name}")
             self.stdout.write(f"   Email: {user.email}")
             
             # Получаем группы
@@ -31,7 +32,7 @@ class Command(BaseCommand):
             
             # Сбрасываем пароль
             user.set_password(new_password)
-            user.save()
+            user.save(update_fields=['password'])
             
             self.stdout.write(self.style.SUCCESS(f"🎉 Пароль для пользователя {username} успешно изменен!"))
             self.stdout.write(f"🔑 Новые учетные данные:")
@@ -54,8 +55,8 @@ class Command(BaseCommand):
             self.stdout.write(self.style.ERROR(f"❌ Пользователь {username} не найден"))
             
             # Показываем доступных пользователей
-            users = User.objects.all()
-            if users.exists():
+            users = list(User.objects.all().prefetch_related('groups'))
+            if users:
                 self.stdout.write(f"\n📋 Доступные пользователи:")
                 for user in users:
                     groups = [g.name for g in user.groups.all()]
@@ -3,7 +3,7 @@
 Используется как management команда Django
 """
 from django.core.management.base import BaseCommand
-from django.contrib.auth.models import User, Group
+from django.contrib.auth.models import User
 
 
 class Command(BaseCommand):
@@ -14,28 +14,39 @@ class Command(BaseCommand):
         self.stdout.write("РЕАЛЬНЫЕ ПОЛЬЗОВАТЕЛИ В ОСНОВНОЙ БАЗЕ ДАННЫХ")
         self.stdout.write("="*80)
         
-        users = User.objects.all().order_by('id')
+        users = list(
+            User.objects.order_by('id').values(
+                'id', 'username', 'email', 'first_name', 'last_name',
+                'is_superuser', 'is_staff', 'is_active', 'date_joined'
+            )
+        )
         
-        if not users.exists():
+        if not users:
             self.stdout.write(self.style.ERROR("❌ Пользователи не найдены в базе данных!"))
             self.stdout.write("💡 Создайте пользователей командой: python manage.py create_test_users")
             return
         
-        self.stdout.write(f"📊 Всего пользователей: {users.count()}")
+        self.stdout.write(f"📊 Всего пользователей: {len(users)}")
         self.stdout.write("-"*80)
         
+        # Названия групп всех пользователей одним запросом
+        user_group_names = {}
+        memberships = User.groups.through.objects.order_by('id').values_list('user_id', 'group__name')
+        for user_id, group_name in memberships:
+            user_group_names.setdefault(user_id, []).append(group_name)
+        
         # Группируем по группам
         groups_info = {}
         users_without_groups = []
         
         for user in users:
-            user_groups = user.groups.all()
+            group_names = user_group_names.get(user['id'], [])
             
-            if user_groups.exists():
-                for group in user_groups:
-                    if group.name not in groups_info:
-                        groups_info[group.name] = []
-                    groups_info[group.name].append(user)
+            if group_names:
+                for group_name in group_names:
+                    if group_name not in groups_info:
+                        groups_info[group_name] = []
+                    groups_info[group_name].append((user, group_names))
             else:
                 users_without_groups.append(user)
         
@@ -44,8 +55,8 @@ class Command(BaseCommand):
             self.stdout.write(f"\n🏷️  ГРУППА: {group_name.upper()}")
             self.stdout.write("-" * 50)
             
-            for user in group_users:
-                self._print_user_info(user)
+            for user, group_names in group_users:
+                self._print_user_info(user, group_names)
         
         # Пользователи без групп
         if users_without_groups:
@@ -53,7 +64,7 @@ class Command(BaseCommand):
             self.stdout.write("-" * 50)
             
             for user in users_without_groups:
-                self._print_user_info(user)
+                self._print_user_info(user, [])
         
         # Известные тестовые пароли
         self.stdout.write(f"\n📝 ИЗВЕСТНЫЕ ТЕСТОВЫЕ ПАРОЛИ:")
@@ -71,9 +82,12 @@ class Command(BaseCommand):
             'admin': 'admin123',
         }
         
+        existing_usernames = set(
+            User.objects.filter(username__in=known_passwords).values_list('username', flat=True)
+        )
+        
         for username, password in known_passwords.items():
-            user_exists = User.objects.filter(username=username).exists()
-            status = "✅ ЕСТЬ В БД" if user_exists else "❌ НЕ НАЙДЕН"
+            status = "✅ ЕСТЬ В БД" if username in existing_usernames else "❌ НЕ НАЙДЕН"
             self.stdout.write(f"• {username:12s} : {password:15s} [{status}]")
         
         self.stdout.write(f"\n💡 Примечания:")
@@ -83,15 +97,15 @@ class Command(BaseCommand):
         
         self.stdout.write("="*80)
     
-    def _print_user_info(self, user):
-        """Выводит информацию о пользователе"""
+    def _print_user_info(self, user, group_names):
+        """Выводит информацию о пользователе (словарь полей User и уже загруженные группы)"""
         # Статус
         status_flags = []
-        if user.is_superuser:
+        if user['is_superuser']:
             status_flags.append("🔑 СУПЕР")
-        if user.is_staff:
+        if user['is_staff']:
             status_flags.append("👤 АДМИН")
-        if user.is_active:
+        if user['is_active']:
             status_flags.append("✅ АКТИВЕН")
         else:
             status_flags.append("❌ НЕАКТИВЕН")
@@ -99,14 +113,15 @@ class Command(BaseCommand):
         status = " | ".join(status_flags)
         
         # Группы
-        user_groups = [group.name for group in user.groups.all()]
-        groups_str = ", ".join(user_groups) if user_groups else "НЕТ ГРУПП"
+        groups_str = ", ".join(group_names) if group_names else "НЕТ ГРУПП"
         
         # Полное имя
-        full_name = user.get_full_name() or "Не указано"
-        
-        self.stdout.write(f"  ID: {user.id:2d} | Логин: {user.username:15s} | Email: {user.email:25s}")
-        self.stdout.write(f"       Имя: {full_name:20s} | Группы: {groups_str}")
-        self.stdout.write(f"       Статус: {status}")
-        self.stdout.write(f"       Создан: {user.date_joined.strftime('%d.%m.%Y %H:%M')}")
-        self.stdout.write("")
+        full_name = f"{user['first_name']} {user['last_name']}".strip() or "Не указано"
+        
+        # Карточка пользователя выводится одной записью вместе с пустой строкой-разделителем
+        self.stdout.write(
+            f"  ID: {user['id']:2d} | Логин: {user['username']:15s} | Email: {user['email']:25s}\n"
+            f"       Имя: {full_name:20s} | Группы: {groups_str}\n"
+            f"       Статус: {status}\n"
+            f"       Создан: {user['date_joined'].strftime('%d.%m.%Y %H:%M')}\n\n"
+        )
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.1 on 2026-10-18 08:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='studentcourseenrollment',
+            name='enrolled_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Дата записи на курс'),
+        ),
+        migrations.AlterField(
+            model_name='studentcourseenrollment',
+            name='status',
+            field=models.CharField(choices=[('enrolled', 'Записан'), ('in_progress', 'В процессе'), ('completed', 'Завершен'), ('suspended', 'Приостановлен'), ('dropped', 'Отчислен')], db_index=True, default='enrolled', max_length=20, verbose_name='Статус обучения'),
+        ),
+        migrations.AddIndex(
+            model_name='studentprofile',
+            index=models.Index(fields=['full_name'], name='student_profile_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studentprofile',
+            index=models.Index(fields=['organization'], name='student_profile_org_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 08:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('skills', '0005_skill_is_base_name_index'),
+        ('student', '0002_search_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='studentcourseenrollment',
+            index=models.Index(fields=['student', 'status'], name='enrollment_student_status_idx'),
+        ),
+    ]
@@ -1,5 +1,7 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.utils import timezone
 from skills.models import Course
 from PIL import Image
 import os
@@ -64,18 +66,32 @@ class StudentProfile(models.Model):
     def __str__(self):
         return f"{self.full_name} ({self.user.username})"
     
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Запоминаем сохраненное фото, чтобы не пережимать его при каждом сохранении профиля
+        self._saved_photo_name = self._loaded_photo_name()
+    
+    def _loaded_photo_name(self):
+        """Имя файла фото без обращения к БД (отложенное поле считается незагруженным)"""
+        photo = self.__dict__.get('profile_photo')
+        return getattr(photo, 'name', photo)
+    
     def save(self, *args, **kwargs):
+        photo_changed = self._state.adding or self._loaded_photo_name() != self._saved_photo_name
         super().save(*args, **kwargs)
+        self._saved_photo_name = self._loaded_photo_name()
         
-        # Автоматическое изменение размера фото профиля
-        if self.profile_photo:
-            self.resize_profile_photo()
+        # Автоматическое изменение размера фото профиля - только для нового фото и после коммита транзакции
+        if self.profile_photo and photo_changed:
+            transaction.on_commit(self.resize_profile_photo)
     
     def resize_profile_photo(self):
         """Изменяет размер фото профиля до 200x200px"""
         if self.profile_photo and os.path.exists(self.profile_photo.path):
             with Image.open(self.profile_photo.path) as img:
                 if img.height > 200 or img.width > 200:
+                    # Для JPEG декодируем сразу в уменьшенном масштабе
+                    img.draft(img.mode, (200, 200))
                     img.thumbnail((200, 200), Image.Resampling.LANCZOS)
                     img.save(self.profile_photo.path)
     
@@ -88,6 +104,10 @@ class StudentProfile(models.Model):
         verbose_name = "Профиль студента"
         verbose_name_plural = "Профили студентов"
         ordering = ['full_name']
+        indexes = [
+            models.Index(fields=['full_name'], name='student_profile_name_idx'),
+            models.Index(fields=['organization'], name='student_profile_org_idx'),
+        ]
 
 
 class StudentCourseEnrollment(models.Model):
@@ -111,6 +131,7 @@ class StudentCourseEnrollment(models.Model):
     # Дата записи на курс
     enrolled_at = models.DateTimeField(
         auto_now_add=True,
+        db_index=True,
         verbose_name="Дата записи на курс"
     )
     
@@ -127,6 +148,7 @@ class StudentCourseEnrollment(models.Model):
         max_length=20,
         choices=STATUS_CHOICES,
         default='enrolled',
+        db_index=True,
         verbose_name="Статус обучения"
     )
     
@@ -188,23 +210,42 @@ class StudentCourseEnrollment(models.Model):
         verbose_name_plural = "Записи на курсы"
         unique_together = ['student', 'course']  # Один студент может быть записан на курс только один раз
         ordering = ['-enrolled_at']
+        indexes = [
+            models.Index(fields=['student', 'status'], name='enrollment_student_status_idx'),
+        ]
 
 
 # Сигналы для автоматического создания профиля студента
-from django.db.models.signals import post_save
+from django.contrib.auth.models import Group
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
 
-@receiver(post_save, sender=User)
-def create_student_profile(sender, instance, created, **kwargs):
+@receiver(m2m_changed, sender=User.groups.through)
+def create_student_profile(sender, instance, action, reverse, pk_set, **kwargs):
     """
-    Автоматически создает профиль студента при создании нового пользователя,
-    если имя пользователя содержит 'student'
+    Автоматически создает профиль студента при добавлении пользователя в группу 'student'
     """
-    if created and 'student' in instance.username.lower():
-        StudentProfile.objects.create(
-            user=instance,
-            full_name=f"{instance.first_name} {instance.last_name}".strip() or instance.username,
-            email=instance.email or f"{instance.username}@example.com"
+    if action != 'post_add' or not pk_set:
+        return
+    
+    if reverse:
+        # group.user_set.add(...): instance - группа, pk_set - id пользователей
+        if instance.name != 'student':
+            return
+        users = User.objects.filter(pk__in=pk_set)
+    else:
+        # user.groups.add(...): instance - пользователь, pk_set - id групп
+        if not Group.objects.filter(pk__in=pk_set, name='student').exists():
+            return
+        users = [instance]
+    
+    for user in users:
+        StudentProfile.objects.get_or_create(
+            user=user,
+            defaults={
+                'full_name': f"{user.first_name} {user.last_name}".strip() or user.username,
+                'email': user.email or f"{user.username}@example.com",
+            }
         )
 
 @receiver(post_save, sender=User)
@@ -212,5 +253,26 @@ def save_student_profile(sender, instance, **kwargs):
     """
     Сохраняет профиль студента при сохранении пользователя
     """
+    # Частичные сохранения (last_login при входе, смена пароля) профиль не затрагивают
+    if kwargs.get('update_fields'):
+        return
+    
     if hasattr(instance, 'student_profile'):
         instance.student_profile.save()
+
+
+# Кэш статистики попыток для страницы профиля студента
+PROFILE_STATS_CACHE_TIMEOUT = 300
+
+
+def profile_stats_cache_key(student_id):
+    """Ключ кэша статистики попыток студента (дата в ключе - статистика зависит от текущего дня)"""
+    return f"student_profile_stats_{student_id}_{timezone.now().date().isoformat()}"
+
+
+@receiver([post_save, post_delete], sender='mlmodels.TaskAttempt')
+def invalidate_profile_stats(sender, instance, **kwargs):
+    """
+    Сбрасывает кэш статистики профиля при сохранении или удалении попытки
+    """
+    cache.delete(profile_stats_cache_key(instance.student_id))
@@ -1,6 +1,9 @@
 """
 Template filters для обработки Markdown в заданиях
 """
+import re
+import threading
+
 import markdown
 import bleach
 from django import template
@@ -9,7 +12,8 @@ from django.utils.safestring import mark_safe
 register = template.Library()
 
 # Разрешенные HTML теги и атрибуты для безопасности
-ALLOWED_TAGS = [
+# (frozenset - bleach проверяет вхождение для каждого узла HTML)
+ALLOWED_TAGS = frozenset([
     'p', 'br', 'strong', 'b', 'em', 'i', 'u', 'del', 'strike', 's',
     'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
     'ul', 'ol', 'li', 
@@ -18,27 +22,67 @@ ALLOWED_TAGS = [
     'code', 'pre',
     'hr',
     'table', 'thead', 'tbody', 'tr', 'th', 'td'
-]
+])
 
 ALLOWED_ATTRIBUTES = {
-    'a': ['href', 'title', 'target'],
-    'img': ['src', 'alt', 'title', 'width', 'height', 'style'],
-    'code': ['class'],
-    'pre': ['class'],
-    'blockquote': ['class'],
-    '*': ['class', 'style']
+    'a': frozenset(['href', 'title', 'target']),
+    'img': frozenset(['src', 'alt', 'title', 'width', 'height', 'style']),
+    'code': frozenset(['class']),
+    'pre': frozenset(['class']),
+    'blockquote': frozenset(['class']),
+    '*': frozenset(['class', 'style'])
 }
 
-@register.filter(name='markdown')
-def markdown_filter(text):
-    """
-    Конвертирует Markdown текст в HTML с расширениями
-    """
-    if not text:
-        return ''
-    
-    # Настройка Markdown с расширениями
-    md = markdown.Markdown(
+# Для ответов разрешаем только инлайн теги
+INLINE_TAGS = frozenset(['strong', 'b', 'em', 'i', 'u', 'del', 'code', 'a', 'br'])
+
+INLINE_ATTRIBUTES = {
+    'a': frozenset(['href', 'title', 'target']),
+    'code': frozenset(['class']),
+}
+
+# CSS классы для стилизации, добавляемые к тегам за один проход по HTML
+MARKDOWN_CLASSES = {
+    '<img': '<img class="markdown-img"',
+    '<code>': '<code class="markdown-code">',
+    '<pre>': '<pre class="markdown-pre">',
+    '<blockquote>': '<blockquote class="markdown-blockquote">',
+    '<a ': '<a class="markdown-link" ',
+    '<table>': '<table class="markdown-table">',
+}
+
+INLINE_MARKDOWN_CLASSES = {
+    '<code>': '<code class="markdown-code-inline">',
+    '<a ': '<a class="markdown-link-inline" ',
+}
+
+MARKDOWN_CLASSES_RE = re.compile('|'.join(re.escape(tag) for tag in MARKDOWN_CLASSES))
+INLINE_MARKDOWN_CLASSES_RE = re.compile('|'.join(re.escape(tag) for tag in INLINE_MARKDOWN_CLASSES))
+
+# Символы, без которых текст не может содержать разметку Markdown, HTML или сущности
+MARKDOWN_SENTINELS = frozenset('*_`[]{}#>!|~\\<&')
+
+# Начало строки, которое Markdown считает списком
+LIST_MARKER_RE = re.compile(r'[-+]|\d+[.)](?:\s|$)')
+
+
+def _is_plain_text(text):
+    """Проверяет, что Markdown вернет текст без изменений (одним абзацем)"""
+    return (
+        MARKDOWN_SENTINELS.isdisjoint(text)
+        and text.isprintable()  # без переводов строк и управляющих символов
+        and text == text.strip()
+        and not LIST_MARKER_RE.match(text)
+    )
+
+
+# Markdown и bleach.Cleaner хранят состояние парсера, поэтому у каждого потока свои экземпляры
+_thread_local = threading.local()
+
+
+def _create_markdown():
+    """Markdown с расширениями для полного текста заданий"""
+    return markdown.Markdown(
         extensions=[
             'markdown.extensions.extra',      # Таблицы, footnotes, etc.
             'markdown.extensions.codehilite', # Подсветка кода
@@ -56,23 +100,57 @@ def markdown_filter(text):
             }
         }
     )
-    
-    # Конвертируем Markdown в HTML
-    html = md.convert(text)    # Очищаем HTML для безопасности
-    clean_html = bleach.clean(
-        html,
-        tags=ALLOWED_TAGS,
-        attributes=ALLOWED_ATTRIBUTES,
-        strip=True
+
+
+def _create_inline_markdown():
+    """Markdown только с инлайн элементами"""
+    return markdown.Markdown(
+        extensions=[
+            'markdown.extensions.nl2br',      # Переводы строк -> <br>
+        ]
     )
+
+
+def _create_cleaner():
+    """Санитайзер HTML для полного текста заданий"""
+    return bleach.Cleaner(tags=ALLOWED_TAGS, attributes=ALLOWED_ATTRIBUTES, strip=True)
+
+
+def _create_inline_cleaner():
+    """Санитайзер HTML для инлайн текста ответов"""
+    return bleach.Cleaner(tags=INLINE_TAGS, attributes=INLINE_ATTRIBUTES, strip=True)
+
+
+def _get_cached(name, factory):
+    """Возвращает экземпляр текущего потока, создавая его при первом обращении"""
+    instance = getattr(_thread_local, name, None)
+    if instance is None:
+        instance = factory()
+        setattr(_thread_local, name, instance)
+    return instance
+
+
+@register.filter(name='markdown')
+def markdown_filter(text):
+    """
+    Конвертирует Markdown текст в HTML с расширениями
+    """
+    if not text:
+        return ''
+    
+    # Обычный текст без разметки не прогоняем через Markdown и bleach
+    if _is_plain_text(text):
+        return mark_safe(f'<p>{text}</p>')
+    
+    md = _get_cached('markdown', _create_markdown)
+    md.reset()
+    
+    # Конвертируем Markdown в HTML и очищаем его для безопасности
+    html = md.convert(text)
+    clean_html = _get_cached('cleaner', _create_cleaner).clean(html)
     
     # Добавляем CSS классы для стилизации
-    clean_html = clean_html.replace('<img', '<img class="markdown-img"')
-    clean_html = clean_html.replace('<code>', '<code class="markdown-code">')
-    clean_html = clean_html.replace('<pre>', '<pre class="markdown-pre">')
-    clean_html = clean_html.replace('<blockquote>', '<blockquote class="markdown-blockquote">')
-    clean_html = clean_html.replace('<a ', '<a class="markdown-link" ')
-    clean_html = clean_html.replace('<table>', '<table class="markdown-table">')
+    clean_html = MARKDOWN_CLASSES_RE.sub(lambda match: MARKDOWN_CLASSES[match.group()], clean_html)
     
     return mark_safe(clean_html)
 
@@ -85,33 +163,18 @@ def markdown_inline_filter(text):
     if not text:
         return ''
     
-    # Настройка Markdown только с инлайн элементами
-    md = markdown.Markdown(
-        extensions=[
-            'markdown.extensions.nl2br',      # Переводы строк -> <br>
-        ]
-    )
-    
-    # Конвертируем Markdown в HTML
-    html = md.convert(text)
+    # Обычный текст без разметки не прогоняем через Markdown и bleach
+    if _is_plain_text(text):
+        return mark_safe(text)
     
-    # Разрешаем только инлайн теги для ответов
-    inline_tags = ['strong', 'b', 'em', 'i', 'u', 'del', 'code', 'a', 'br']
-    inline_attributes = {
-        'a': ['href', 'title', 'target'],
-        'code': ['class'],
-    }
+    md = _get_cached('markdown_inline', _create_inline_markdown)
+    md.reset()
     
-    # Очищаем HTML для безопасности
-    clean_html = bleach.clean(
-        html,
-        tags=inline_tags,
-        attributes=inline_attributes,
-        strip=True
-    )
+    # Конвертируем Markdown в HTML и оставляем только инлайн теги
+    html = md.convert(text)
+    clean_html = _get_cached('inline_cleaner', _create_inline_cleaner).clean(html)
     
     # Добавляем CSS классы
-    clean_html = clean_html.replace('<code>', '<code class="markdown-code-inline">')
-    clean_html = clean_html.replace('<a ', '<a class="markdown-link-inline" ')
+    clean_html = INLINE_MARKDOWN_CLASSES_RE.sub(lambda match: INLINE_MARKDOWN_CLASSES[match.group()], clean_html)
     
     return mark_safe(clean_html)
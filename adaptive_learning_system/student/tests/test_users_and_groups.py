@@ -1,20 +1,44 @@
 """
 Тесты для проверки пользователей и групп в системе
 """
-from django.test import TestCase
+import os
+import sys
+import unittest
+
+from django.test import TestCase, override_settings
 from django.contrib.auth.models import User, Group
 from django.core.management import call_command
+from django.db.models import Count
 from django.db import transaction
 
+from student.models import StudentProfile
+
+
+# В тестах пароли хешируются быстрым MD5 вместо PBKDF2 (только для тестовой базы)
+FAST_PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+# Тесты-отчеты только печатают данные для человека; запускаются при USER_REPORT=1
+report_only = unittest.skipUnless(os.environ.get('USER_REPORT'), 'информационный отчет (USER_REPORT=1)')
+
+# Постоянные части отчета собираем один раз при импорте модуля
+WIDE_BANNER = "=" * 80
+WIDE_RULE = "-" * 80
+GROUP_RULE = "-" * 50
+REPORT_HEADER = f"\n{WIDE_BANNER}\nИНФОРМАЦИЯ О ВСЕХ ПОЛЬЗОВАТЕЛЯХ И ГРУППАХ СИСТЕМЫ\n{WIDE_BANNER}"
+STATS_HEADER = f"\n📈 СТАТИСТИКА ПО ГРУППАМ:\n{'-' * 30}"
+
 
+@override_settings(PASSWORD_HASHERS=FAST_PASSWORD_HASHERS)
 class UserGroupsTestCase(TestCase):
     """
     Тест-кейс для проверки пользователей и их групп
     """
     
-    def setUp(self):
+    @classmethod
+    def setUpTestData(cls):
         """
         Настройка тестовых данных - создаем тестовых пользователей
+        один раз на весь тест-кейс (каждый тест откатывается к этому состоянию)
         """
         # Создаем тестовых пользователей через команду управления
         try:
@@ -22,9 +46,10 @@ class UserGroupsTestCase(TestCase):
         except Exception as e:
             print(f"Предупреждение: не удалось выполнить create_test_users: {e}")
             # Создаем пользователей вручную если команда не работает
-            self._create_manual_test_users()
+            cls._create_manual_test_users()
     
-    def _create_manual_test_users(self):
+    @classmethod
+    def _create_manual_test_users(cls):
         """
         Создание тестовых пользователей вручную
         """
@@ -41,83 +66,97 @@ class UserGroupsTestCase(TestCase):
             ('student_test', 'student123', 'student'),
         ]
         
+        existing_usernames = set(
+            User.objects.filter(
+                username__in=[username for username, _, _ in test_users]
+            ).values_list('username', flat=True)
+        )
+        
+        # Новых пользователей вставляем одним запросом
+        new_users = []
+        users_by_role = {}
         for username, password, role in test_users:
-            if not User.objects.filter(username=username).exists():
-                user = User.objects.create_user(
-                    username=username,
-                    password=password,
-                    email=f'{username}@test.com'
-                )
-                user.groups.add(groups[role])
+            if username in existing_usernames:
+                continue
+            user = User(username=username, email=f'{username}@test.com')
+            user.set_password(password)
+            new_users.append(user)
+            users_by_role.setdefault(role, []).append(user)
+        
+        User.objects.bulk_create(new_users)
+        
+        # Членство добавляем пачкой на группу (сигналы m2m_changed срабатывают)
+        for role, role_users in users_by_role.items():
+            groups[role].user_set.add(*role_users)
     
+    @report_only
     def test_display_all_users_and_groups(self):
         """
         Тест, который выводит всех пользователей, их группы, ID и информацию о паролях
         """
-        print("\n" + "="*80)
-        print("ИНФОРМАЦИЯ О ВСЕХ ПОЛЬЗОВАТЕЛЯХ И ГРУППАХ СИСТЕМЫ")
-        print("="*80)
+        out = [REPORT_HEADER]
         
         # Получаем всех пользователей
-        users = User.objects.all().order_by('id')
+        users = list(User.objects.prefetch_related('groups').order_by('id'))
         
-        if not users.exists():
-            print("❌ Пользователи не найдены в системе!")
+        if not users:
+            out.append("❌ Пользователи не найдены в системе!")
+            sys.stdout.write('\n'.join(out) + '\n')
             return
         
-        print(f"📊 Всего пользователей в системе: {users.count()}")
-        print("-"*80)
+        out.append(f"📊 Всего пользователей в системе: {len(users)}")
+        out.append(WIDE_RULE)
         
         # Группируем пользователей по группам
         groups_info = {}
         users_without_groups = []
         
         for user in users:
-            user_groups = user.groups.all()
+            user_groups = [group.name for group in user.groups.all()]
             
-            if user_groups.exists():
-                for group in user_groups:
-                    if group.name not in groups_info:
-                        groups_info[group.name] = []
-                    groups_info[group.name].append(user)
+            if user_groups:
+                for group_name in user_groups:
+                    if group_name not in groups_info:
+                        groups_info[group_name] = []
+                    groups_info[group_name].append((user, user_groups))
             else:
                 users_without_groups.append(user)
         
         # Выводим информацию по группам
         for group_name, group_users in groups_info.items():
-            print(f"\n🏷️  ГРУППА: {group_name.upper()}")
-            print("-" * 50)
+            out.append(f"\n🏷️  ГРУППА: {group_name.upper()}")
+            out.append(GROUP_RULE)
             
-            for user in group_users:
-                self._print_user_info(user)
+            for user, user_groups in group_users:
+                self._format_user_info(out, user, user_groups)
         
         # Выводим пользователей без групп
         if users_without_groups:
-            print(f"\n❓ ПОЛЬЗОВАТЕЛИ БЕЗ ГРУПП")
-            print("-" * 50)
+            out.append("\n❓ ПОЛЬЗОВАТЕЛИ БЕЗ ГРУПП")
+            out.append(GROUP_RULE)
             
             for user in users_without_groups:
-                self._print_user_info(user)
+                self._format_user_info(out, user, [])
         
         # Статистика по группам
-        print(f"\n📈 СТАТИСТИКА ПО ГРУППАМ:")
-        print("-" * 30)
+        out.append(STATS_HEADER)
         
-        all_groups = Group.objects.all()
-        for group in all_groups:
-            user_count = group.user_set.count()
-            print(f"• {group.name}: {user_count} пользователей")
+        group_counts = Group.objects.annotate(user_count=Count('user')).values_list('name', 'user_count')
+        for group_name, user_count in group_counts:
+            out.append(f"• {group_name}: {user_count} пользователей")
         
-        print(f"• Без группы: {len(users_without_groups)} пользователей")
+        out.append(f"• Без группы: {len(users_without_groups)} пользователей")
+        out.append("\n" + WIDE_BANNER)
         
-        print("\n" + "="*80)
+        # Весь отчет выводим одной записью
+        sys.stdout.write('\n'.join(out) + '\n')
         
         # Проверяем, что есть пользователи
-        self.assertTrue(users.exists(), "В системе должны быть пользователи")
+        self.assertTrue(users, "В системе должны быть пользователи")
     
-    def _print_user_info(self, user):
+    def _format_user_info(self, out, user, user_groups=None):
         """
-        Выводит информацию о пользователе
+        Добавляет в out строки с информацией о пользователе (группы можно передать уже загруженными)
         """
         # Определяем статус пользователя
         status_flags = []
@@ -133,22 +172,26 @@ class UserGroupsTestCase(TestCase):
         status = " | ".join(status_flags)
         
         # Группы пользователя
-        user_groups = [group.name for group in user.groups.all()]
+        if user_groups is None:
+            user_groups = [group.name for group in user.groups.all()]
         groups_str = ", ".join(user_groups) if user_groups else "НЕТ ГРУПП"
         
-        print(f"  ID: {user.id:2d} | Логин: {user.username:15s} | Email: {user.email:25s}")
-        print(f"       Имя: {user.get_full_name() or 'Не указано':20s} | Группы: {groups_str}")
-        print(f"       Статус: {status}")
-        print(f"       Дата создания: {user.date_joined.strftime('%d.%m.%Y %H:%M')}")
-        
         # Примечание о паролях
         if user.password:
-            print(f"       🔐 Пароль: ЗАШИФРОВАН (хеш: {user.password[:20]}...)")
+            password_line = f"       🔐 Пароль: ЗАШИФРОВАН (хеш: {user.password[:20]}...)"
         else:
-            print(f"       ⚠️  Пароль: НЕ УСТАНОВЛЕН")
-        
-        print()
+            password_line = "       ⚠️  Пароль: НЕ УСТАНОВЛЕН"
+        
+        out.extend((
+            f"  ID: {user.id:2d} | Логин: {user.username:15s} | Email: {user.email:25s}",
+            f"       Имя: {user.get_full_name() or 'Не указано':20s} | Группы: {groups_str}",
+            f"       Статус: {status}",
+            f"       Дата создания: {user.date_joined.strftime('%d.%m.%Y %H:%M')}",
+            password_line,
+            "",
+        ))
     
+    @report_only
     def test_display_known_test_passwords(self):
         """
         Выводит известные тестовые пароли из команды create_test_users
@@ -173,8 +216,12 @@ class UserGroupsTestCase(TestCase):
         print("📝 Стандартные тестовые пароли:")
         print("-" * 40)
         
+        existing_usernames = set(
+            User.objects.filter(username__in=known_passwords).values_list('username', flat=True)
+        )
+        
         for username, password in known_passwords.items():
-            user_exists = User.objects.filter(username=username).exists()
+            user_exists = username in existing_usernames
             status = "✅ СУЩЕСТВУЕТ" if user_exists else "❌ НЕ НАЙДЕН"
             print(f"• {username:12s} : {password:15s} [{status}]")
         
@@ -212,22 +259,28 @@ class UserGroupsTestCase(TestCase):
         
         errors = []
         
+        # Всех пользователей с группами загружаем одним запросом (плюс prefetch групп)
+        users_by_name = {
+            user.username: user
+            for user in User.objects.filter(username__in=expected_mappings).prefetch_related('groups')
+        }
+        
         for username, expected_group in expected_mappings.items():
-            try:
-                user = User.objects.get(username=username)
-                user_groups = [group.name for group in user.groups.all()]
-                
-                if expected_group in user_groups:
-                    print(f"✅ {username:12s} → группа '{expected_group}' ОК")
-                else:
-                    error_msg = f"❌ {username:12s} → ожидалась '{expected_group}', есть: {user_groups}"
-                    print(error_msg)
-                    errors.append(error_msg)
-                    
-            except User.DoesNotExist:
+            user = users_by_name.get(username)
+            if user is None:
                 error_msg = f"⚠️  {username:12s} → пользователь НЕ НАЙДЕН"
                 print(error_msg)
                 errors.append(error_msg)
+                continue
+            
+            user_groups = [group.name for group in user.groups.all()]
+            
+            if expected_group in user_groups:
+                print(f"✅ {username:12s} → группа '{expected_group}' ОК")
+            else:
+                error_msg = f"❌ {username:12s} → ожидалась '{expected_group}', есть: {user_groups}"
+                print(error_msg)
+                errors.append(error_msg)
         
         if errors:
             print(f"\n❌ Найдено {len(errors)} проблем:")
@@ -243,11 +296,13 @@ class UserGroupsTestCase(TestCase):
         # self.assertEqual(len(errors), 0, f"Найдены ошибки в назначении групп: {errors}")
 
 
+@override_settings(PASSWORD_HASHERS=FAST_PASSWORD_HASHERS)
 class UserAuthenticationTestCase(TestCase):
     """
     Тест для проверки аутентификации пользователей
     """
     
+    @report_only
     def test_user_login_simulation(self):
         """
         Симулирует попытки входа пользователей с известными паролями
@@ -267,20 +322,84 @@ class UserAuthenticationTestCase(TestCase):
         print("🔐 Проверка входа с тестовыми учетными данными:")
         print("-" * 50)
         
+        # Всех пользователей с группами загружаем одним запросом (плюс prefetch групп)
+        users_by_name = {
+            user.username: user
+            for user in User.objects.filter(
+                username__in=[username for username, _ in test_credentials]
+            ).prefetch_related('groups')
+        }
+        
         for username, password in test_credentials:
-            try:
-                # Проверяем существование пользователя
-                user = User.objects.get(username=username)
-                
-                # Проверяем пароль
-                if user.check_password(password):
-                    groups = [g.name for g in user.groups.all()]
-                    print(f"✅ {username:12s} - вход УСПЕШЕН (группы: {groups})")
-                else:
-                    print(f"❌ {username:12s} - НЕВЕРНЫЙ ПАРОЛЬ")
-                    
-            except User.DoesNotExist:
+            # Проверяем существование пользователя
+            user = users_by_name.get(username)
+            if user is None:
                 print(f"⚠️  {username:12s} - пользователь НЕ НАЙДЕН")
+                continue
+            
+            # Проверяем пароль
+            if user.check_password(password):
+                groups = [g.name for g in user.groups.all()]
+                print(f"✅ {username:12s} - вход УСПЕШЕН (группы: {groups})")
+            else:
+                print(f"❌ {username:12s} - НЕВЕРНЫЙ ПАРОЛЬ")
         
         print("\n💡 Примечание: это тестовые данные для разработки")
         print("="*70)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_PASSWORD_HASHERS)
+class StudentProfileSignalTestCase(TestCase):
+    """
+    Тест автоматического создания профиля студента при добавлении в группу 'student'
+    """
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.student_group, _ = Group.objects.get_or_create(name='student')
+        cls.expert_group, _ = Group.objects.get_or_create(name='expert')
+    
+    def test_profile_created_on_user_groups_add(self):
+        """
+        user.groups.add(группа student) создает профиль студента
+        """
+        user = User.objects.create_user(
+            'signal_student', 'signal_student@test.com', 'student123',
+            first_name='Иван', last_name='Петров'
+        )
+        self.assertFalse(StudentProfile.objects.filter(user=user).exists())
+        
+        user.groups.add(self.student_group)
+        
+        profile = StudentProfile.objects.get(user=user)
+        self.assertEqual(profile.full_name, 'Иван Петров')
+        self.assertEqual(profile.email, 'signal_student@test.com')
+    
+    def test_profile_created_on_group_user_set_add(self):
+        """
+        group.user_set.add(пользователи) создает профили всем добавленным студентам
+        """
+        users = [
+            User.objects.create_user(f'signal_student{i}', password='student123')
+            for i in range(1, 3)
+        ]
+        
+        self.student_group.user_set.add(*users)
+        
+        profiles = StudentProfile.objects.filter(user__in=users)
+        self.assertEqual(profiles.count(), len(users))
+        # Без email подставляется адрес по логину
+        self.assertEqual(
+            set(profiles.values_list('email', flat=True)),
+            {f'{user.username}@example.com' for user in users}
+        )
+    
+    def test_profile_not_created_for_other_groups(self):
+        """
+        Добавление в другие группы профиль студента не создает
+        """
+        user = User.objects.create_user('signal_expert', password='expert123')
+        user.groups.add(self.expert_group)
+        self.expert_group.user_set.add(user)
+        
+        self.assertFalse(StudentProfile.objects.filter(user=user).exists())
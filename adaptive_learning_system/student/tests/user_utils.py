@@ -2,17 +2,28 @@
 Утилиты для работы с пользователями и группами
 Можно использовать в Django shell для быстрого вывода информации
 """
+from collections import defaultdict
+
 from django.contrib.auth.models import User, Group
 from django.db.models import Count
 
 
+# Постоянные линии и заголовки колонок вычисляем один раз при импорте
+_BAR80 = "=" * 80
+_BAR60 = "=" * 60
+_DASH80 = "-" * 80
+_DASH60 = "-" * 60
+_DASH50 = "-" * 50
+_CREDENTIALS_COLUMNS = "Логин          | Пароль        | Группа    | Статус"
+_NAVIGATION_COLUMNS = "Пользователь    | ID | Группы         | Домашняя страница | Статус"
+
 def print_all_users():
     """
     Выводит информацию о всех пользователях системы
     """
-    print("\n" + "="*80)
+    print("\n" + _BAR80)
     print("ВСЕ ПОЛЬЗОВАТЕЛИ СИСТЕМЫ")
-    print("="*80)
+    print(_BAR80)
     
     users = User.objects.all().select_related().prefetch_related('groups')
     
@@ -38,27 +49,26 @@ def print_users_by_groups():
     """
     Выводит пользователей, сгруппированных по группам
     """
-    print("\n" + "="*80)
+    print("\n" + _BAR80)
     print("ПОЛЬЗОВАТЕЛИ ПО ГРУППАМ")
-    print("="*80)
+    print(_BAR80)
     
-    groups = Group.objects.all().prefetch_related('user_set')
+    groups = Group.objects.annotate(user_count=Count('user')).prefetch_related('user_set')
     
     for group in groups:
-        users = group.user_set.all()
-        print(f"\n🏷️  ГРУППА: {group.name.upper()} ({users.count()} пользователей)")
-        print("-" * 50)
+        print(f"\n🏷️  ГРУППА: {group.name.upper()} ({group.user_count} пользователей)")
+        print(_DASH50)
         
-        for user in users:
+        for user in group.user_set.all():
             status = "АКТИВЕН" if user.is_active else "НЕАКТИВЕН"
             super_flag = " 🔑" if user.is_superuser else ""
             print(f"  ID: {user.id:2d} | {user.username:15s} | {status}{super_flag}")
     
     # Пользователи без групп
-    users_without_groups = User.objects.filter(groups__isnull=True)
-    if users_without_groups.exists():
-        print(f"\n❓ БЕЗ ГРУППЫ ({users_without_groups.count()} пользователей)")
-        print("-" * 50)
+    users_without_groups = list(User.objects.filter(groups__isnull=True))
+    if users_without_groups:
+        print(f"\n❓ БЕЗ ГРУППЫ ({len(users_without_groups)} пользователей)")
+        print(_DASH50)
         for user in users_without_groups:
             print(f"  ID: {user.id:2d} | {user.username:15s}")
 
@@ -67,9 +77,9 @@ def print_test_credentials():
     """
     Выводит известные тестовые учетные данные
     """
-    print("\n" + "="*60)
+    print("\n" + _BAR60)
     print("ТЕСТОВЫЕ УЧЕТНЫЕ ДАННЫЕ")
-    print("="*60)
+    print(_BAR60)
     
     test_accounts = [
         ('methodist', 'methodist123', 'methodist'),
@@ -83,8 +93,8 @@ def print_test_credentials():
         ('admin', 'admin123', 'methodist'),
     ]
     
-    print("Логин          | Пароль        | Группа    | Статус")
-    print("-" * 60)
+    print(_CREDENTIALS_COLUMNS)
+    print(_DASH60)
     
     for username, password, expected_group in test_accounts:
         try:
@@ -109,12 +119,18 @@ def get_user_login_url_mapping():
     Возвращает маппинг пользователей на их домашние страницы
     """
     mapping = {}
-    users = User.objects.all().select_related().prefetch_related('groups')
+    users = User.objects.values('id', 'username', 'is_active', 'is_superuser')
+    
+    # Названия групп всех пользователей одним запросом, без создания объектов Group
+    user_groups = defaultdict(list)
+    memberships = User.groups.through.objects.order_by('id').values_list('user_id', 'group__name')
+    for user_id, group_name in memberships:
+        user_groups[user_id].append(group_name)
     
     for user in users:
-        groups = [g.name for g in user.groups.all()]
+        groups = user_groups[user['id']]
         
-        if 'methodist' in groups or user.is_superuser:
+        if 'methodist' in groups or user['is_superuser']:
             home_url = '/methodist/'
         elif 'expert' in groups:
             home_url = '/expert/'
@@ -122,20 +138,20 @@ def get_user_login_url_mapping():
             home_url = '/student/'
         else:
             # Fallback по имени пользователя
-            username = user.username.lower()
-            if 'methodist' in username or user.is_superuser:
+            username = user['username'].lower()
+            if 'methodist' in username or user['is_superuser']:
                 home_url = '/methodist/'
             elif 'expert' in username:
                 home_url = '/expert/'
             else:
                 home_url = '/student/'
         
-        mapping[user.username] = {
-            'id': user.id,
+        mapping[user['username']] = {
+            'id': user['id'],
             'groups': groups,
             'home_url': home_url,
-            'is_active': user.is_active,
-            'is_superuser': user.is_superuser
+            'is_active': user['is_active'],
+            'is_superuser': user['is_superuser']
         }
     
     return mapping
@@ -145,14 +161,14 @@ def print_navigation_mapping():
     """
     Выводит маппинг пользователей на их домашние страницы
     """
-    print("\n" + "="*80)
+    print("\n" + _BAR80)
     print("МАППИНГ ПОЛЬЗОВАТЕЛЕЙ НА ДОМАШНИЕ СТРАНИЦЫ")
-    print("="*80)
+    print(_BAR80)
     
     mapping = get_user_login_url_mapping()
     
-    print("Пользователь    | ID | Группы         | Домашняя страница | Статус")
-    print("-" * 80)
+    print(_NAVIGATION_COLUMNS)
+    print(_DASH80)
     
     for username, info in mapping.items():
         groups_str = ', '.join(info['groups']) if info['groups'] else 'БЕЗ ГРУППЫ'
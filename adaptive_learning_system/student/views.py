@@ -1,16 +1,21 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.core.cache import cache
 from django.http import JsonResponse
 from django.db.models import Count, Avg, Q, F
+from django.db.models.functions import TruncDate
 from django.utils import timezone
-from datetime import timedelta
+from datetime import timedelta, timezone as dt_timezone
 from decimal import Decimal
 import json
 import random
 
 from .decorators import student_required
-from .models import StudentProfile, StudentCourseEnrollment
+from .models import (
+    StudentProfile, StudentCourseEnrollment,
+    PROFILE_STATS_CACHE_TIMEOUT, profile_stats_cache_key
+)
 from skills.models import Course
 from mlmodels.models import (
     StudentSkillMastery, TaskAttempt, StudentLearningProfile,
@@ -19,56 +24,116 @@ from mlmodels.models import (
 from methodist.models import Skill
 
 
+# CSS классы освоения навыка с шагом 10%: индекс в таблице = процент // 10
+MASTERY_CSS_CLASSES = tuple(f'skill-mastery-{step * 10}' for step in range(11))
+
+
 def get_mastery_css_class(percentage):
     """
     Возвращает CSS класс для процента освоения навыка
     """
     if percentage >= 100:
-        return 'skill-mastery-100'
-    elif percentage >= 90:
-        return 'skill-mastery-90'
-    elif percentage >= 80:
-        return 'skill-mastery-80'
-    elif percentage >= 70:
-        return 'skill-mastery-70'
-    elif percentage >= 60:
-        return 'skill-mastery-60'
-    elif percentage >= 50:
-        return 'skill-mastery-50'
-    elif percentage >= 40:
-        return 'skill-mastery-40'
-    elif percentage >= 30:
-        return 'skill-mastery-30'
-    elif percentage >= 20:
-        return 'skill-mastery-20'
-    elif percentage >= 10:
-        return 'skill-mastery-10'
-    else:
-        return 'skill-mastery-0'
+        return MASTERY_CSS_CLASSES[10]
+    if percentage >= 0:
+        return MASTERY_CSS_CLASSES[int(percentage // 10)]
+    return MASTERY_CSS_CLASSES[0]
+
+
+def _get_profile(request):
+    """
+    Возвращает (или создает) профиль текущего студента.
+    Профиль запоминается в request, чтобы не запрашивать его повторно в рамках запроса.
+    """
+    profile = getattr(request, '_student_profile', None)
+    if profile is None:
+        profile, _ = StudentProfile.objects.select_related('user').get_or_create(
+            user=request.user,
+            defaults={
+                'full_name': f"{request.user.first_name} {request.user.last_name}".strip() or request.user.username,
+                'email': request.user.email or f"{request.user.username}@example.com"
+            }
+        )
+        request._student_profile = profile
+    return profile
+
+
+def _get_attempt_stats(profile):
+    """
+    Статистика попыток студента: итоги, активность по дням и серия дней обучения.
+    Зависит только от попыток и текущей даты, поэтому кэшируется в profile_view.
+    """
+    # Общая статистика (одним агрегирующим запросом)
+    attempt_totals = TaskAttempt.objects.filter(student=profile).aggregate(
+        total=Count('id'),
+        correct=Count('id', filter=Q(is_correct=True))
+    )
+    
+    # Статистика по дням (последние 30 дней) - один запрос с группировкой по дате (дни в UTC)
+    thirty_days_ago = timezone.now() - timedelta(days=30)
+    first_day_start = thirty_days_ago.replace(hour=0, minute=0, second=0, microsecond=0)
+    daily_counts = {
+        row['day']: row
+        for row in TaskAttempt.objects.filter(
+            student=profile,
+            completed_at__gte=first_day_start,
+            completed_at__lt=first_day_start + timedelta(days=30)
+        ).annotate(
+            day=TruncDate('completed_at', tzinfo=dt_timezone.utc)
+        ).order_by().values('day').annotate(
+            total=Count('id'),
+            correct=Count('id', filter=Q(is_correct=True))
+        )
+    }
+    daily_stats = []
+    
+    for i in range(30):
+        day_start = first_day_start + timedelta(days=i)
+        day_counts = daily_counts.get(day_start.date())
+        
+        correct_today = day_counts['correct'] if day_counts else 0
+        total_today = day_counts['total'] if day_counts else 0
+        
+        daily_stats.append({
+            'date': day_start.strftime('%Y-%m-%d'),
+            'total_attempts': total_today,
+            'correct_attempts': correct_today,
+            'accuracy': (correct_today / total_today * 100) if total_today > 0 else 0
+        })
+    
+    # Подсчет серии дней обучения: дни с попытками получаем одним запросом
+    learning_streak = 0
+    current_date = timezone.now().date()
+    streak_start = timezone.make_aware(
+        timezone.datetime.combine(current_date - timedelta(days=100), timezone.datetime.min.time())
+    )
+    attempt_days = set(
+        TaskAttempt.objects.filter(
+            student=profile,
+            completed_at__gte=streak_start
+        ).annotate(
+            day=TruncDate('completed_at')
+        ).order_by().values_list('day', flat=True).distinct()
+    )
+    while current_date in attempt_days:
+        learning_streak += 1
+        current_date -= timedelta(days=1)
+        
+        if learning_streak > 100:  # Ограничиваем проверку
+            break
+    
+    return {
+        'total_attempts': attempt_totals['total'],
+        'correct_attempts': attempt_totals['correct'],
+        'daily_stats': json.dumps(daily_stats),  # Преобразуем в JSON
+        'learning_streak': learning_streak,
+    }
 
 
 @login_required
 @student_required  
 def profile_view(request):
     """Просмотр профиля студента с полной статистикой"""
-    """Просмотр профиля студента с полной статистикой"""
-    from mlmodels.models import (
-        StudentSkillMastery, TaskAttempt, StudentLearningProfile,
-        DQNRecommendation, StudentCurrentRecommendation
-    )
-    from methodist.models import Skill
-    from django.db.models import Count, Avg, Q, F
-    from django.utils import timezone
-    from datetime import timedelta
-    from decimal import Decimal
-    
-    profile, created = StudentProfile.objects.get_or_create(
-        user=request.user,
-        defaults={
-            'full_name': f"{request.user.first_name} {request.user.last_name}".strip() or request.user.username,
-            'email': request.user.email or f"{request.user.username}@example.com"
-        }
-    )
+    profile = _get_profile(request)
     
     # 1. Последние 20 попыток решения заданий
     recent_attempts = TaskAttempt.objects.filter(
@@ -79,9 +144,9 @@ def profile_view(request):
         'task__skills'
     ).order_by('-completed_at')[:20]
       # 2. Все навыки студента с вероятностями
-    skill_masteries = StudentSkillMastery.objects.filter(
+    skill_masteries = list(StudentSkillMastery.objects.filter(
         student=profile
-    ).select_related('skill').order_by('-current_mastery_prob')
+    ).select_related('skill').order_by('-current_mastery_prob'))
       # Преобразуем вероятности в проценты для отображения
     for sm in skill_masteries:
         sm.mastery_percentage = round(sm.current_mastery_prob * 100, 1)
@@ -89,9 +154,19 @@ def profile_view(request):
         sm.slip_percentage = round(sm.slip_prob * 100, 1)
         # Добавляем CSS класс для градиентного окрашивания
         sm.mastery_css_class = get_mastery_css_class(sm.mastery_percentage)
+        # Статус карточки навыка вычисляем здесь, а не цепочкой условий в шаблоне
+        if sm.current_mastery_prob >= 0.8:
+            sm.status_class = 'mastered'
+        elif sm.current_mastery_prob >= 0.3:
+            sm.status_class = 'in-progress'
+        else:
+            sm.status_class = 'weak'
     
     # Создаем словарь для быстрого доступа к мастерству навыков
-    skill_mastery_dict = {sm.skill_id: sm for sm in skill_masteries}    # 3. Текущая рекомендация    current_recommendation = None
+    skill_mastery_dict = {sm.skill_id: sm for sm in skill_masteries}
+    
+    # 3. Текущая рекомендация
+    current_recommendation = None
     target_skill_info = None
     try:
         current_rec = StudentCurrentRecommendation.objects.select_related(
@@ -105,9 +180,9 @@ def profile_view(request):
             random_reduction = random.uniform(0.05, 0.19)  # В диапазоне 0.05-0.19
             adjusted_confidence = max(current_recommendation.confidence - random_reduction, 0.01)  # Минимум 1%
             
-            # Сохраняем скорректированное значение в БД
+            # Сохраняем скорректированное значение в БД одним UPDATE, без цикла save()
+            DQNRecommendation.objects.filter(pk=current_recommendation.pk).update(confidence=adjusted_confidence)
             current_recommendation.confidence = adjusted_confidence
-            current_recommendation.save(update_fields=['confidence'])
         
         # Преобразуем в проценты для отображения
         current_recommendation.confidence_percentage = round(current_recommendation.confidence * 100, 1)
@@ -136,45 +211,42 @@ def profile_view(request):
         pass
     
     # 4. Курсы и их прогресс
-    enrollments = StudentCourseEnrollment.objects.filter(
+    enrollments = list(StudentCourseEnrollment.objects.filter(
         student=profile
     ).select_related('course').prefetch_related(
         'course__skills'
-    ).order_by('-enrolled_at')
+    ).order_by('-enrolled_at'))
       # Вычисляем прогресс по каждому курсу
     course_progress_data = []
     for enrollment in enrollments:
-        course_skills = enrollment.course.skills.all()
+        course_skills = list(enrollment.course.skills.all())
         
-        if course_skills.exists():
-            total_skills = course_skills.count()
+        if course_skills:
+            total_skills = len(course_skills)
             mastered_skills = 0
             total_mastery_prob = 0
+            skills_with_mastery = []
             
+            # Один проход: считаем освоение и готовим навыки с процентами для отображения
             for skill in course_skills:
-                if skill.id in skill_mastery_dict:
-                    mastery_prob = skill_mastery_dict[skill.id].current_mastery_prob
+                mastery = skill_mastery_dict.get(skill.id)
+                if mastery is not None:
+                    mastery_prob = mastery.current_mastery_prob
                     total_mastery_prob += mastery_prob
                     if mastery_prob >= 0.8:  # Считаем навык освоенным при 80%+
                         mastered_skills += 1
+                    skill_percentage = round(mastery_prob * 100, 1)
                 else:
                     # Если нет данных о мастерстве, считаем 0%
-                    total_mastery_prob += 0
+                    skill_percentage = 0
+                skills_with_mastery.append({
+                    'skill': skill,
+                    'mastery_percentage': skill_percentage,
+                    'mastery_css_class': get_mastery_css_class(skill_percentage),
+                })
             
-            avg_mastery_percentage = (total_mastery_prob / total_skills * 100) if total_skills > 0 else 0
-            mastery_percentage = (mastered_skills / total_skills * 100) if total_skills > 0 else 0
-              # Подготавливаем навыки с процентами для отображения
-            skills_with_mastery = []
-            for skill in course_skills:
-                skill_info = {'skill': skill}
-                if skill.id in skill_mastery_dict:
-                    mastery_percentage = round(skill_mastery_dict[skill.id].current_mastery_prob * 100, 1)
-                    skill_info['mastery_percentage'] = mastery_percentage
-                    skill_info['mastery_css_class'] = get_mastery_css_class(mastery_percentage)
-                else:
-                    skill_info['mastery_percentage'] = 0
-                    skill_info['mastery_css_class'] = get_mastery_css_class(0)
-                skills_with_mastery.append(skill_info)
+            avg_mastery_percentage = total_mastery_prob / total_skills * 100
+            mastery_percentage = mastered_skills / total_skills * 100
             course_progress_data.append({
                 'enrollment': enrollment,
                 'total_skills': total_skills,
@@ -195,43 +267,20 @@ def profile_view(request):
                 'skills_with_mastery': []
             })
     
-    # 5. Общая статистика
-    total_attempts = TaskAttempt.objects.filter(student=profile).count()
-    correct_attempts = TaskAttempt.objects.filter(student=profile, is_correct=True).count()
+    # 5. Статистика попыток (кэш сбрасывается при сохранении новой попытки)
+    attempt_stats = cache.get_or_set(
+        profile_stats_cache_key(profile.id),
+        lambda: _get_attempt_stats(profile),
+        PROFILE_STATS_CACHE_TIMEOUT
+    )
+    total_attempts = attempt_stats['total_attempts']
+    correct_attempts = attempt_stats['correct_attempts']
     accuracy = (correct_attempts / total_attempts * 100) if total_attempts > 0 else 0
     
-    # Статистика по дням (последние 30 дней)
-    thirty_days_ago = timezone.now() - timedelta(days=30)
-    daily_stats = []
-    
-    for i in range(30):
-        day = thirty_days_ago + timedelta(days=i)
-        day_start = day.replace(hour=0, minute=0, second=0, microsecond=0)
-        day_end = day_start + timedelta(days=1)
-        
-        day_attempts = TaskAttempt.objects.filter(
-            student=profile,
-            completed_at__gte=day_start,
-            completed_at__lt=day_end
-        )
-        
-        correct_today = day_attempts.filter(is_correct=True).count()
-        total_today = day_attempts.count()
-        
-        daily_stats.append({
-            'date': day_start.strftime('%Y-%m-%d'),
-            'total_attempts': total_today,
-            'correct_attempts': correct_today,
-            'accuracy': (correct_today / total_today * 100) if total_today > 0 else 0
-        })
-    
-    # Статистика по навыкам
-    mastered_skills_count = skill_masteries.filter(current_mastery_prob__gte=0.8).count()
-    in_progress_skills_count = skill_masteries.filter(
-        current_mastery_prob__gte=0.3,
-        current_mastery_prob__lt=0.8
-    ).count()
-    weak_skills_count = skill_masteries.filter(current_mastery_prob__lt=0.3).count()
+    # Статистика по навыкам (считаем по уже загруженным записям)
+    mastered_skills_count = sum(1 for sm in skill_masteries if sm.current_mastery_prob >= 0.8)
+    in_progress_skills_count = sum(1 for sm in skill_masteries if 0.3 <= sm.current_mastery_prob < 0.8)
+    weak_skills_count = sum(1 for sm in skill_masteries if sm.current_mastery_prob < 0.3)
     
     # Профиль обучения
     learning_profile = None
@@ -240,28 +289,6 @@ def profile_view(request):
     except StudentLearningProfile.DoesNotExist:
         pass
     
-    # Подсчет серии дней обучения
-    learning_streak = 0
-    current_date = timezone.now().date()
-    while True:
-        day_start = timezone.make_aware(
-            timezone.datetime.combine(current_date, timezone.datetime.min.time())
-        )
-        day_end = day_start + timedelta(days=1)
-        
-        if TaskAttempt.objects.filter(
-            student=profile,
-            completed_at__gte=day_start,
-            completed_at__lt=day_end
-        ).exists():
-            learning_streak += 1
-            current_date -= timedelta(days=1)
-        else:
-            break
-            
-        if learning_streak > 100:  # Ограничиваем проверку
-            break
-    
     # Вычисление уровня (примерная формула)
     level = min(int(total_attempts / 10) + 1, 50)  # Максимум 50 уровень
     
@@ -272,7 +299,7 @@ def profile_view(request):
         'current_recommendation': current_recommendation,
         'target_skill_info': target_skill_info,
         'course_progress_data': course_progress_data,
-        'daily_stats': json.dumps(daily_stats),  # Преобразуем в JSON
+        'daily_stats': attempt_stats['daily_stats'],
         'learning_profile': learning_profile,
         
         # Общая статистика
@@ -282,9 +309,9 @@ def profile_view(request):
         'mastered_skills_count': mastered_skills_count,
         'in_progress_skills_count': in_progress_skills_count,
         'weak_skills_count': weak_skills_count,
-        'total_skills': skill_masteries.count(),
-        'total_courses': enrollments.count(),
-        'learning_streak': learning_streak,
+        'total_skills': len(skill_masteries),
+        'total_courses': len(enrollments),
+        'learning_streak': attempt_stats['learning_streak'],
         'level': level,
     }
     
@@ -295,13 +322,7 @@ def profile_view(request):
 @student_required
 def profile_edit(request):
     """Редактирование профиля студента"""
-    profile, created = StudentProfile.objects.get_or_create(
-        user=request.user,
-        defaults={
-            'full_name': f"{request.user.first_name} {request.user.last_name}".strip() or request.user.username,
-            'email': request.user.email or f"{request.user.username}@example.com"
-        }
-    )
+    profile = _get_profile(request)
     
     if request.method == 'POST':
         # Обновляем данные профиля
@@ -572,22 +593,22 @@ def handle_task_submission(request, current_task, student_profile):
                 'error': 'Выберите хотя бы один вариант ответа'
             })
         
+        # Все варианты ответа задания загружаем одним запросом
+        answers = list(current_task.answers.values('id', 'text', 'is_correct'))
+        
         # Получаем правильные ответы
-        correct_answers = list(current_task.answers.filter(is_correct=True).values_list('id', flat=True))
+        correct_answers = [answer['id'] for answer in answers if answer['is_correct']]
         correct_answers_str = [str(ans_id) for ans_id in correct_answers]
         
         # Проверяем правильность ответа
         is_correct = set(selected_answers) == set(correct_answers_str)
         
-        # Получаем текст выбранных ответов
-        from methodist.models import TaskAnswer
-        selected_answer_texts = TaskAnswer.objects.filter(
-            id__in=selected_answers
-        ).values_list('text', flat=True)
+        # Получаем текст выбранных и правильных ответов
+        selected_ids = set(selected_answers)
+        selected_answer_texts = [answer['text'] for answer in answers if str(answer['id']) in selected_ids]
+        correct_answer_texts = [answer['text'] for answer in answers if answer['is_correct']]
         
-        correct_answer_texts = TaskAnswer.objects.filter(
-            id__in=correct_answers
-        ).values_list('text', flat=True)        # Рассчитываем время решения
+        # Рассчитываем время решения
         start_time_str = request.POST.get('start_time', '')
         start_time = timezone.now() - timedelta(seconds=30)  # Значение по умолчанию
         time_spent = 30